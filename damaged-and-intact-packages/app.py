@@ -1,8 +1,27 @@
 import streamlit as st
-import streamlit.components.v1 as components
 from PIL import Image
 import base64
+from datetime import date, datetime, timedelta
 from io import BytesIO
+import time
+import numpy as np
+import pandas as pd
+
+# Heavy stacks stay out of the startup path: TensorFlow is imported by the
+# background model load, OpenCV only when the server stream is started
+import assets
+from async_front import Busy, inference_front
+from inference import (
+    BATCH_SIZE, THRESHOLD_PATH, get_classifier, load_threshold, model_cache, model_fingerprint, split_scores,
+    split_scores_batch, verdict, verdict_batch,
+)
+import metrics
+from panel import result_panel, webcam_panel
+from prediction_cache import content_hash, prediction_cache
+from preprocess import INPUT_SIZE, PREVIEW_MAX_SIDE, decode, prepare_batch, prepare_image, preview_bytes
+from result_log import result_log
+from similarity import embedding_index, remember
+from tiles import TileResult, heatmap_overlay, inspect_tiles
 
 # ========================
 # Page config
@@ -15,7 +34,183 @@ st.set_page_config(
 st.title("📦 Package Damage Detection")
 st.caption("AI-based package inspection — DAMAGED & INTACT probabilities")
 
-TM_MODEL_URL = "https://teachablemachine.withgoogle.com/models/XPTjPjJOe/"
+# Pinned TF.js runtime + model, served locally with immutable caching once vendored (see assets.py)
+web_assets = assets.asset_urls()
+
+# Load + warm up the local model once per process in the background, so the
+# page renders immediately; the first prediction waits for it if needed
+model_cache.warm_up_in_background()
+metrics.start_http_server()  # /metrics for Prometheus when METRICS_PORT is set
+assets.start_http_server()  # /static/ for the vendored browser assets when ASSETS_PORT is set
+
+with st.sidebar.expander("⚙️ Model cache"):
+    if not model_cache.loaded:
+        st.caption("Model loading in the background...")
+    st.json(model_cache.stats)
+
+# ========================
+# Server-side helpers
+# ========================
+# Reruns come with every widget change: previews are built once per image (by content hash), not per rerun
+@st.cache_data(max_entries=64, show_spinner=False)
+def preview_data_uri(digest, _data):
+    """Data URI for a bounded-size preview of an uploaded image; ``digest`` is its ``content_hash``."""
+    preview, mime = preview_bytes(Image.open(BytesIO(_data)), _data)
+    return f"data:{mime};base64,{base64.b64encode(preview).decode()}"
+
+
+@st.cache_data(show_spinner=False)
+def browser_threshold(model_version, threshold_file):
+    """``threshold.json`` for the browser model, or None (DAMAGED > INTACT).
+
+    Only when the asset manifest says the TF.js model was exported with the
+    weights the threshold was evaluated for; ``threshold_file`` (its
+    fingerprint) re-reads the file when it changes.
+    """
+    return load_threshold(THRESHOLD_PATH, model_version, strict=True) if model_version else None
+
+
+def score_image(data, name):
+    """Probabilities and similar past inspections for one encoded image (runs on the inference front).
+
+    Returns ``(probs, matches, duplicate)``. With an embedding index the
+    forward pass also yields the penultimate-layer embedding; an exact repeat
+    (same bytes, cached scores and a stored embedding) skips the model.
+    """
+    classifier = get_classifier()
+    key = prediction_cache.key(classifier.version, data)
+    probs = prediction_cache.get(key)
+    index = embedding_index(classifier)
+    vector = index.vector(content_hash(data)) if index is not None and probs is not None else None
+    if index is not None and vector is None:
+        # Own Image object: the reduced-resolution decode must not shrink the caller's preview
+        features, batch_probs = classifier.embed_batch(prepare_batch([Image.open(BytesIO(data))], normalized=True))
+        vector = features[0]
+        probs = {label: float(p) for label, p in zip(classifier.labels, batch_probs[0])}
+        prediction_cache.put(key, probs)
+    elif probs is None:
+        probs = classifier.predict(prepare_batch([Image.open(BytesIO(data))], normalized=True)[0])
+        prediction_cache.put(key, probs)
+    if index is None:
+        return probs, [], None
+    damaged, intact = split_scores(probs)
+    return probs, *remember(index, [vector], [content_hash(data)], [name], [damaged], [intact])[0]
+
+
+def score_tiles(data):
+    """Tile scores for one encoded image, cached by content hash like whole-image scores."""
+    classifier = get_classifier()
+    key = f"{prediction_cache.key(classifier.version, data)}:tiles"
+    cached = prediction_cache.get(key)
+    if cached is not None:
+        return TileResult.from_json(cached)
+    tiled = inspect_tiles(classifier, Image.open(BytesIO(data)))
+    prediction_cache.put(key, tiled.to_json())
+    return tiled
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def heatmap_data_uri(digest, model_version, _data, _tiled):
+    """JPEG data URI of a bounded-size preview with the tile damage heatmap on top.
+
+    Cached like the plain preview; the tiles depend on the model, so its version is part of the key.
+    """
+    # Own Image, decoded in draft mode and turned upright like the plain preview
+    preview = decode(Image.open(BytesIO(_data)), PREVIEW_MAX_SIDE)
+    preview.thumbnail((PREVIEW_MAX_SIDE, PREVIEW_MAX_SIDE), Image.BILINEAR)
+    buffered = BytesIO()
+    heatmap_overlay(preview, _tiled.damaged_grid).save(buffered, format="JPEG", quality=85)
+    return f"data:image/jpeg;base64,{base64.b64encode(buffered.getvalue()).decode()}"
+
+
+def score_misses(files, batch_size):
+    """Batch-score uncached uploads; ``({label: probability}, embedding or None)`` per file.
+
+    Files that do not decode get an error string instead and are left out of
+    the batch, so one truncated upload does not cost the others their verdicts.
+    """
+    classifier = get_classifier()
+    pixels = np.empty((len(files), INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+    results, good = [None] * len(files), []
+    for i, f in enumerate(files):
+        try:
+            with Image.open(BytesIO(f.getvalue())) as image:
+                prepare_image(image, out=pixels[len(good)])
+            good.append(i)
+        except Exception as error:  # unreadable / truncated files are reported, not fatal (as in score.py)
+            results[i] = f"{type(error).__name__}: {error}"
+            metrics.errors.inc(stage="decode")
+    pixels = pixels[:len(good)]
+    if not good:
+        return results
+    if not classifier.embeddings:
+        scored = [(row, None) for row in classifier.predict_many(pixels, batch_size=batch_size)]
+    else:
+        scored = []
+        for start in range(0, len(pixels), batch_size):
+            features, probs = classifier.embed_batch(pixels[start:start + batch_size])
+            scored += zip(probs, features)
+    for i, (row, vector) in zip(good, scored):
+        results[i] = ({label: float(p) for label, p in zip(classifier.labels, row)}, vector)
+    return results
+
+
+def show_busy(busy):
+    st.warning(f"⏳ The inspection queue is full ({busy.waiting} waiting). Please try again in a moment.")
+
+
+def run_on_front(fn, *args):
+    """``fn(*args)`` on the inference front under a spinner; None (with a notice) when it is busy."""
+    with st.spinner("Analyzing..."):
+        try:
+            return inference_front.run(
+                fn, *args, on_queued=lambda position: st.caption(f"Queued at position {position}...")
+            )
+        except Busy as busy:
+            show_busy(busy)
+            return None
+
+
+def first_inspection(*key):
+    """True the first time this session shows inspection ``key``; reruns of the same one return False.
+
+    Streamlit reruns the script on every widget change, so counters and the
+    result log keyed like this see each upload (file id + content hash) once, as
+    the webcam path does with ``live["seq"]``.
+    """
+    seen = st.session_state.setdefault("inspections", set())
+    if key in seen:
+        return False
+    seen.add(key)
+    return True
+
+
+def predict_uploaded(data, name, file_id, source="upload"):
+    """``(damaged, intact, matches, duplicate)`` for an uploaded image, or None when the front is busy."""
+    result = run_on_front(score_image, data, name)
+    if result is None:
+        return None
+    probs, matches, duplicate = result
+    damaged, intact = split_scores(probs)
+    if first_inspection(source, file_id, content_hash(data)):
+        metrics.record_verdicts([verdict(damaged, intact)], source=source)
+        result_log.record(source, damaged, intact, [verdict(damaged, intact)], [content_hash(data)], get_classifier().version)
+    return damaged, intact, matches, duplicate
+
+
+def show_similar(matches, duplicate):
+    if duplicate:
+        st.info(
+            f"♻️ Near-duplicate of **{duplicate.meta['name']}** inspected {duplicate.meta['time']} "
+            f"({duplicate.meta['verdict']}, similarity {duplicate.similarity:.3f})"
+        )
+    if matches:
+        with st.expander("🔎 Similar past inspections"):
+            st.dataframe(pd.DataFrame([
+                {"similarity": round(m.similarity, 3), **{k: v for k, v in m.meta.items() if k != "key"}}
+                for m in matches
+            ]), use_container_width=True, hide_index=True)
+
 
 # ========================
 # Tabs
@@ -26,554 +221,203 @@ tab1, tab2 = st.tabs(["📷 Live Webcam", "📁 Upload Image"])
 # TAB 1: LIVE WEBCAM - UPDATED TO MATCH UPLOAD TAB
 # ========================
 with tab1:
-    webcam_html = f"""
-    <html>
-    <head>
-        <style>
-            * {{
-                box-sizing: border-box;
-            }}
-            body {{
-                background: #0f0f0f;
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-                color: white;
-                text-align: center;
-                margin: 0;
-                padding: 0;
-            }}
-            .app-container {{
-                display: grid;
-                grid-template-columns: 1fr 380px;
-                grid-template-rows: 1fr;
-                gap: 0;
-                height: 520px;
-                width: 100%;
-                max-width: 1200px;
-                margin: 0 auto;
-                background: #1c1c1c;
-                border-radius: 16px;
-                overflow: hidden;
-                box-shadow: 0 6px 20px rgba(0, 0, 0, 0.5);
-            }}
-            .webcam-panel {{
-                position: relative;
-                background: #111;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                overflow: hidden;
-            }}
-            #webcam-container {{
-                max-width: 100%;
-                max-height: 100%;
-                border-radius: 12px;
-                object-fit: contain;
-            }}
-            .panel-label {{
-                position: absolute;
-                bottom: 16px;
-                left: 16px;
-                background: rgba(0,0,0,0.8);
-                color: #fff;
-                padding: 8px 16px;
-                border-radius: 20px;
-                font-size: 13px;
-                font-weight: 500;
-            }}
-            .controls {{
-                position: absolute;
-                top: 20px;
-                right: 20px;
-                display: flex;
-                gap: 12px;
-            }}
-            button {{
-                padding: 12px 24px;
-                font-size: 14px;
-                font-weight: 600;
-                border-radius: 12px;
-                border: none;
-                cursor: pointer;
-                transition: all 0.2s ease;
-                font-family: inherit;
-            }}
-            .start-btn {{
-                background: #2ecc71;
-                color: white;
-            }}
-            .start-btn:hover {{
-                background: #27ae60;
-                transform: translateY(-1px);
-            }}
-            .stop-btn {{
-                background: #e74c3c;
-                color: white;
-            }}
-            .stop-btn:hover {{
-                background: #c0392b;
-                transform: translateY(-1px);
-            }}
-            .status {{
-                position: absolute;
-                top: 20px;
-                left: 20px;
-                background: rgba(0,0,0,0.8);
-                padding: 8px 16px;
-                border-radius: 20px;
-                font-size: 13px;
-                font-weight: 500;
-            }}
-            .results-panel {{
-                background: #1c1c1c;
-                padding: 24px;
-                display: flex;
-                flex-direction: column;
-                gap: 20px;
-            }}
-            .main-result {{
-                background: #2d2d2d;
-                padding: 24px;
-                border-radius: 16px;
-                text-align: center;
-                border: 1px solid #404040;
-                box-shadow: 0 4px 12px rgba(0,0,0,0.2);
-            }}
-            .main-title {{
-                font-size: 14px;
-                color: #aaa;
-                font-weight: 500;
-                margin-bottom: 12px;
-                text-transform: uppercase;
-                letter-spacing: 0.5px;
-            }}
-            .main-prediction {{
-                font-size: 36px;
-                font-weight: 800;
-                margin: 0;
-                line-height: 1.1;
-            }}
-            .confidence {{
-                font-size: 20px;
-                font-weight: 600;
-                margin-top: 4px;
-            }}
-            .predictions-list {{
-                flex: 1;
-                display: flex;
-                flex-direction: column;
-                gap: 16px;
-            }}
-            .prediction-item {{
-                padding: 18px 20px;
-                border-radius: 12px;
-                display: flex;
-                align-items: center;
-                gap: 16px;
-                border: 1px solid #333;
-                transition: all 0.3s ease;
-                backdrop-filter: blur(10px);
-            }}
-            .prediction-item:hover {{
-                transform: translateY(-2px);
-                box-shadow: 0 8px 25px rgba(0,0,0,0.3);
-            }}
-            .damaged-item {{
-                background: rgba(231, 76, 60, 0.15);
-                border-left: 4px solid #e74c3c;
-            }}
-            .intact-item {{
-                background: rgba(46, 204, 113, 0.15);
-                border-left: 4px solid #2ecc71;
-            }}
-            .pred-label {{
-                font-size: 16px;
-                font-weight: 700;
-                flex: 1;
-            }}
-            .pred-bar-bg {{
-                width: 110px;
-                height: 12px;
-                background: #333;
-                border-radius: 6px;
-                overflow: hidden;
-                flex-shrink: 0;
-            }}
-            .pred-bar {{
-                height: 100%;
-                border-radius: 6px;
-                transition: width 0.8s cubic-bezier(0.4, 0, 0.2, 1);
-            }}
-            .damaged-bar {{
-                background: linear-gradient(90deg, #e74c3c, #ff6b7a);
-            }}
-            .intact-bar {{
-                background: linear-gradient(90deg, #2ecc71, #27ae60);
-            }}
-            .pred-percent {{
-                font-size: 18px;
-                font-weight: 800;
-                min-width: 50px;
-                text-align: right;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="app-container">
-            <!-- WEBCAM PANEL -->
-            <div class="webcam-panel">
-                <div id="webcam-container"></div>
-                <div class="panel-label">📷 Live Webcam</div>
-                <div class="controls">
-                    <button class="start-btn" onclick="startWebcam()">▶ Start</button>
-                    <button class="stop-btn" onclick="stopWebcam()">⏹ Stop</button>
-                </div>
-                <div id="status" class="status">Status: Idle</div>
-            </div>
-            
-            <!-- RESULTS PANEL -->
-            <div class="results-panel">
-                <div class="main-result">
-                    <div class="main-title">Live Detection</div>
-                    <div id="main-prediction" class="main-prediction">Waiting...</div>
-                    <div id="confidence" class="confidence">00%</div>
-                </div>
-                
-                <div class="predictions-list">
-                    <div class="prediction-item damaged-item">
-                        <div class="pred-label">DAMAGED</div>
-                        <div class="pred-bar-bg">
-                            <div id="damaged-bar" class="pred-bar damaged-bar" style="width: 0%"></div>
-                        </div>
-                        <div id="damaged-text" class="pred-percent">0%</div>
-                    </div>
-                    <div class="prediction-item intact-item">
-                        <div class="pred-label">INTACT</div>
-                        <div class="pred-bar-bg">
-                            <div id="intact-bar" class="pred-bar intact-bar" style="width: 0%"></div>
-                        </div>
-                        <div id="intact-text" class="pred-percent">0%</div>
-                    </div>
-                </div>
-            </div>
-        </div>
-
-        <script src="https://cdn.jsdelivr.net/npm/@tensorflow/tfjs@latest/dist/tf.min.js"></script>
-        <script src="https://cdn.jsdelivr.net/npm/@teachablemachine/image@latest/dist/teachablemachine-image.min.js"></script>
-
-        <script>
-            const URL="{TM_MODEL_URL}";
-            let model, webcam, running = false;
-
-            async function startWebcam() {{
-                if(running) return;
-                
-                document.getElementById("status").textContent = "Status: Loading model...";
-                try {{
-                    model = await tmImage.load(URL+"model.json", URL+"metadata.json");
-                    
-                    webcam = new tmImage.Webcam(480, 480, true);
-                    await webcam.setup();
-                    await webcam.play();
-                    
-                    running = true;
-                    document.getElementById("status").textContent = "Status: Live";
-                    const container = document.getElementById("webcam-container");
-                    container.innerHTML = "";
-                    container.appendChild(webcam.canvas);
-                    
-                    loop();
-                }} catch (error) {{
-                    console.error("Webcam error:", error);
-                    document.getElementById("status").textContent = "Status: Error";
-                }}
-            }}
-
-            async function loop() {{
-                if(!running) return;
-                webcam.update();
-                await predict();
-                requestAnimationFrame(loop);
-            }}
-
-            async function predict() {{
-                try {{
-                    const predictions = await model.predict(webcam.canvas);
-                    let damaged = 0, intact = 0;
-                    
-                    predictions.forEach(p => {{
-                        if(p.className.toLowerCase().includes("damage")) {{
-                            damaged = Math.max(damaged, p.probability);
-                        }} else {{
-                            intact = Math.max(intact, p.probability);
-                        }}
-                    }});
-
-                    const damagedPct = Math.round(damaged * 100);
-                    const intactPct = Math.round(intact * 100);
-                    
-                    const mainClass = damagedPct > intactPct ? 'DAMAGED' : 'INTACT';
-                    const mainConf = Math.max(damagedPct, intactPct);
-                    const mainColor = mainClass === 'DAMAGED' ? '#e74c3c' : '#2ecc71';
-                    
-                    document.getElementById('main-prediction').textContent = mainClass;
-                    document.getElementById('main-prediction').style.color = mainColor;
-                    document.getElementById('confidence').textContent = mainConf + '%';
-                    document.getElementById('confidence').style.color = mainColor;
-                    
-                    document.getElementById('damaged-bar').style.width = damagedPct + '%';
-                    document.getElementById('damaged-text').textContent = damagedPct + '%';
-                    document.getElementById('damaged-text').style.color = '#e74c3c';
-                    
-                    document.getElementById('intact-bar').style.width = intactPct + '%';
-                    document.getElementById('intact-text').textContent = intactPct + '%';
-                    document.getElementById('intact-text').style.color = '#2ecc71';
-                    
-                }} catch (error) {{
-                    console.error('Prediction error:', error);
-                }}
-            }}
-
-            function stopWebcam() {{
-                if(!running) return;
-                running = false;
-                if(webcam) webcam.stop();
-                document.getElementById("status").textContent = "Status: Stopped";
-                document.getElementById("webcam-container").innerHTML = "";
-                // Reset all values
-                document.getElementById('main-prediction').textContent = 'Waiting...';
-                document.getElementById('confidence').textContent = '00%';
-                document.getElementById('damaged-bar').style.width = '0%';
-                document.getElementById('damaged-text').textContent = '0%';
-                document.getElementById('intact-bar').style.width = '0%';
-                document.getElementById('intact-text').textContent = '0%';
-            }}
-        </script>
-    </body>
-    </html>
-    """
-    components.html(webcam_html, height=560)
+    # Browser-side live inspection; the panel stays mounted, so the TF.js model loads once
+    threshold = browser_threshold(assets.browser_model_version(), model_fingerprint(THRESHOLD_PATH))
+    live = webcam_panel(web_assets, threshold)
+    if live and live["seq"] != st.session_state.get("webcam_seq"):
+        st.session_state["webcam_seq"] = live["seq"]
+        metrics.record_verdicts([live["verdict"]], source="webcam")
+        result_log.record("webcam", live["damaged"], live["intact"], [live["verdict"]])  # browser model, no image bytes
+
+    # Offline path: score a camera snapshot with the local model
+    snapshot = st.camera_input("📸 Snapshot inspection (runs on the local model)", key="camera_snapshot")
+    if snapshot:
+        data = snapshot.getvalue()
+        result = predict_uploaded(data, "webcam snapshot", snapshot.file_id, source="webcam-snapshot")
+        if result:
+            damaged, intact, matches, duplicate = result
+            with metrics.span("render"):
+                result_panel(
+                    preview_data_uri(content_hash(data), data), damaged, intact, verdict(damaged, intact), "📸 Snapshot",
+                    key="snapshot_panel",
+                )
+            show_similar(matches, duplicate)
+
+    # Server-side stream: capture, inference and rendering decoupled (see stream.py)
+    with st.expander("🎥 Server stream (camera attached to this machine, or a video file)"):
+        source = st.text_input("Camera index or video file", value="0", key="stream_source")
+        target_fps = st.slider("Inference rate (frames/s)", 1, 30, 5, key="stream_fps")
+        change_threshold = st.slider("Change threshold (mean pixel diff; skip inference below)", 0.0, 30.0, 6.0, key="stream_gate")
+        smoothing = st.slider("Smoothing (weight of newest scores, 1 = off)", 0.05, 1.0, 0.3, key="stream_ema")
+        start_col, stop_col = st.columns(2)
+        pipeline = st.session_state.get("stream_pipeline")
+        if start_col.button("▶ Start stream") and not (pipeline and pipeline.running):
+            from live import ChangeGate, LiveScorer, VerdictSmoother
+            from stream import StreamPipeline
+
+            try:
+                classifier = get_classifier()
+                scorer = LiveScorer(classifier, ChangeGate(change_threshold), VerdictSmoother(smoothing))
+                pipeline = StreamPipeline(source, classifier, target_fps, scorer=scorer).start()
+                st.session_state["stream_pipeline"] = pipeline
+            except RuntimeError as error:
+                st.error(str(error))
+        if stop_col.button("⏹ Stop stream") and pipeline:
+            pipeline.stop()
+
+        if pipeline and pipeline.running:
+            frame_slot, result_slot = st.columns([2, 1])
+            frame_view = frame_slot.empty()
+            result_view = result_slot.empty()
 
 # ========================
 # TAB 2: UPLOAD IMAGE (same design as webcam)
 # ========================
 with tab2:
-    uploaded_file = st.file_uploader("Upload Image", type=["jpg","jpeg","png"], key="file_uploader")
-    
-    if uploaded_file:
-        image = Image.open(uploaded_file)
-        buffered = BytesIO()
-        image.save(buffered, format="PNG")
-        img_base64 = base64.b64encode(buffered.getvalue()).decode()
-        
-        upload_html = f"""
-        <style>
-            /* SAME EXACT STYLES AS WEBCAM TAB */
-            * {{ box-sizing: border-box; }}
-            .app-container {{
-                display: grid;
-                grid-template-columns: 1fr 380px;
-                grid-template-rows: 1fr;
-                gap: 0;
-                height: 500px;
-                width: 100%;
-                background: #1c1c1c;
-                border-radius: 16px;
-                overflow: hidden;
-                box-shadow: 0 6px 20px rgba(0, 0, 0, 0.5);
-            }}
-            .image-panel {{
-                position: relative;
-                background: #111;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                overflow: hidden;
-            }}
-            .image-panel img {{
-                max-width: 100%;
-                max-height: 100%;
-                object-fit: contain;
-            }}
-            .image-label {{
-                position: absolute;
-                bottom: 16px;
-                left: 16px;
-                background: rgba(0,0,0,0.8);
-                color: #fff;
-                padding: 8px 16px;
-                border-radius: 20px;
-                font-size: 13px;
-                font-weight: 500;
-            }}
-            .results-panel {{
-                background: #1c1c1c;
-                padding: 24px;
-                display: flex;
-                flex-direction: column;
-                gap: 20px;
-            }}
-            .main-result {{
-                background: #2d2d2d;
-                padding: 24px;
-                border-radius: 16px;
-                text-align: center;
-                border: 1px solid #404040;
-                box-shadow: 0 4px 12px rgba(0,0,0,0.2);
-            }}
-            .main-title {{
-                font-size: 14px;
-                color: #aaa;
-                font-weight: 500;
-                margin-bottom: 12px;
-                text-transform: uppercase;
-                letter-spacing: 0.5px;
-            }}
-            .main-prediction {{
-                font-size: 36px;
-                font-weight: 800;
-                margin: 0;
-                line-height: 1.1;
-            }}
-            .confidence {{
-                font-size: 20px;
-                font-weight: 600;
-                margin-top: 4px;
-            }}
-            .predictions-list {{
-                flex: 1;
-                display: flex;
-                flex-direction: column;
-                gap: 16px;
-            }}
-            .prediction-item {{
-                padding: 18px 20px;
-                border-radius: 12px;
-                display: flex;
-                align-items: center;
-                gap: 16px;
-                border: 1px solid #333;
-                transition: all 0.3s ease;
-            }}
-            .prediction-item:hover {{
-                transform: translateY(-2px);
-                box-shadow: 0 8px 25px rgba(0,0,0,0.3);
-            }}
-            .damaged-item {{
-                background: rgba(231, 76, 60, 0.15);
-                border-left: 4px solid #e74c3c;
-            }}
-            .intact-item {{
-                background: rgba(46, 204, 113, 0.15);
-                border-left: 4px solid #2ecc71;
-            }}
-            .pred-label {{
-                font-size: 16px;
-                font-weight: 700;
-                flex: 1;
-            }}
-            .pred-bar-bg {{
-                width: 110px;
-                height: 12px;
-                background: #333;
-                border-radius: 6px;
-                overflow: hidden;
-                flex-shrink: 0;
-            }}
-            .pred-bar {{
-                height: 100%;
-                border-radius: 6px;
-                transition: width 0.8s cubic-bezier(0.4, 0, 0.2, 1);
-            }}
-            .damaged-bar {{
-                background: linear-gradient(90deg, #e74c3c, #ff6b7a);
-            }}
-            .intact-bar {{
-                background: linear-gradient(90deg, #2ecc71, #27ae60);
-            }}
-            .pred-percent {{
-                font-size: 18px;
-                font-weight: 800;
-                min-width: 50px;
-                text-align: right;
-            }}
-        </style>
-
-        <div class="app-container">
-            <div class="image-panel">
-                <img src="data:image/png;base64,{img_base64}">
-                <div class="image-label">📁 Uploaded Package</div>
-            </div>
-            <div class="results-panel">
-                <div class="main-result">
-                    <div class="main-title">Prediction Result</div>
-                    <div id="main-prediction" class="main-prediction">Analyzing...</div>
-                    <div id="confidence" class="confidence">Loading...</div>
-                </div>
-                <div class="predictions-list">
-                    <div class="prediction-item damaged-item">
-                        <div class="pred-label">DAMAGED</div>
-                        <div class="pred-bar-bg">
-                            <div id="damaged-bar" class="pred-bar damaged-bar" style="width: 0%"></div>
-                        </div>
-                        <div id="damaged-text" class="pred-percent">0%</div>
-                    </div>
-                    <div class="prediction-item intact-item">
-                        <div class="pred-label">INTACT</div>
-                        <div class="pred-bar-bg">
-                            <div id="intact-bar" class="pred-bar intact-bar" style="width: 0%"></div>
-                        </div>
-                        <div id="intact-text" class="pred-percent">0%</div>
-                    </div>
-                </div>
-            </div>
-        </div>
-
-        <script src="https://cdn.jsdelivr.net/npm/@tensorflow/tfjs@latest/dist/tf.min.js"></script>
-        <script src="https://cdn.jsdelivr.net/npm/@teachablemachine/image@latest/dist/teachablemachine-image.min.js"></script>
-        <script>
-            const URL="{TM_MODEL_URL}";
-            async function predictImage() {{
-                try {{
-                    const model = await tmImage.load(URL+"model.json", URL+"metadata.json");
-                    const img = new Image();
-                    img.src="data:image/png;base64,{img_base64}";
-                    await new Promise(resolve => {{ img.onload = resolve; }});
-                    const predictions = await model.predict(img);
-                    let damaged = 0, intact = 0;
-                    predictions.forEach(p => {{
-                        if(p.className.toLowerCase().includes("damage")) {{
-                            damaged = Math.max(damaged, p.probability);
-                        }} else {{
-                            intact = Math.max(intact, p.probability);
-                        }}
-                    }});
-                    const damagedPct = Math.round(damaged * 100);
-                    const intactPct = Math.round(intact * 100);
-                    const mainClass = damagedPct > intactPct ? 'DAMAGED' : 'INTACT';
-                    const mainConf = Math.max(damagedPct, intactPct);
-                    const mainColor = mainClass === 'DAMAGED' ? '#e74c3c' : '#2ecc71';
-                    document.getElementById('main-prediction').textContent = mainClass;
-                    document.getElementById('main-prediction').style.color = mainColor;
-                    document.getElementById('confidence').textContent = mainConf + '%';
-                    document.getElementById('confidence').style.color = mainColor;
-                    document.getElementById('damaged-bar').style.width = damagedPct + '%';
-                    document.getElementById('damaged-text').textContent = damagedPct + '%';
-                    document.getElementById('damaged-text').style.color = '#e74c3c';
-                    document.getElementById('intact-bar').style.width = intactPct + '%';
-                    document.getElementById('intact-text').textContent = intactPct + '%';
-                    document.getElementById('intact-text').style.color = '#2ecc71';
-                }} catch (error) {{
-                    console.error('Prediction error:', error);
-                }}
-            }}
-            predictImage();
-        </script>
-        """
-        components.html(upload_html, height=520)
+    uploaded_files = st.file_uploader(
+        "Upload Image", type=["jpg","jpeg","png"], accept_multiple_files=True, key="file_uploader"
+    )
+
+    if len(uploaded_files) == 1:
+        # Model input and preview each decode only as many pixels as they need (JPEG draft mode)
+        data = uploaded_files[0].getvalue()
+        if st.toggle("🔍 Tiled inspection (large or multi-parcel photos)", key="tiled_inspection"):
+            # Overlapping tiles in one batch; verdict from the worst tile, heatmap over the preview
+            tiled = run_on_front(score_tiles, data)
+            if tiled:
+                if first_inspection("upload-tiled", uploaded_files[0].file_id, content_hash(data)):
+                    metrics.record_verdicts([verdict(tiled.damaged, tiled.intact)], source="upload-tiled")
+                    result_log.record(
+                        "upload-tiled", tiled.damaged, tiled.intact, [verdict(tiled.damaged, tiled.intact)],
+                        [content_hash(data)], get_classifier().version,
+                    )
+                with metrics.span("render"):
+                    result_panel(
+                        heatmap_data_uri(content_hash(data), get_classifier().version, data, tiled),
+                        tiled.damaged, tiled.intact,
+                        verdict(tiled.damaged, tiled.intact), f"🔍 {tiled.tiles} tiles • worst tile", key="upload_panel",
+                    )
+        else:
+            result = predict_uploaded(data, uploaded_files[0].name, uploaded_files[0].file_id)
+            if result:
+                damaged, intact, matches, duplicate = result
+                with metrics.span("render"):
+                    result_panel(
+                        preview_data_uri(content_hash(data), data), damaged, intact, verdict(damaged, intact),
+                        "📁 Uploaded Package", key="upload_panel",
+                    )
+                show_similar(matches, duplicate)
+
+    elif uploaded_files:
+        # Batch inspection: one forward pass per chunk of images
+        batch_size = st.number_input("Batch size", min_value=1, max_value=256, value=BATCH_SIZE, step=8)
+        with st.spinner(f"Inspecting {len(uploaded_files)} images..."):
+            classifier = get_classifier()
+            index = embedding_index(classifier)
+            hashes = [content_hash(f.getvalue()) for f in uploaded_files]
+            keys = [prediction_cache.key(classifier.version, f.getvalue()) for f in uploaded_files]
+            cached = [prediction_cache.get(key) for key in keys]
+            # Exact repeats with a stored embedding skip the model; everything else gets one forward pass
+            vectors = [index.vector(h) if index is not None else None for h in hashes]
+            misses = [i for i, probs in enumerate(cached) if probs is None or (index is not None and vectors[i] is None)]
+            unreadable = []
+            if misses:
+                try:
+                    scored = inference_front.run(score_misses, [uploaded_files[i] for i in misses], int(batch_size))
+                except Busy as busy:
+                    scored = None
+                    show_busy(busy)
+                for i, outcome in zip(misses, scored or []):
+                    if isinstance(outcome, str):  # could not be decoded; the rest of the batch is still scored
+                        unreadable.append({"filename": uploaded_files[i].name, "error": outcome})
+                        continue
+                    cached[i], vectors[i] = outcome
+                    prediction_cache.put(keys[i], cached[i])
+            done = [i for i, probs in enumerate(cached) if probs is not None and (index is None or vectors[i] is not None)]
+            uploaded_files = [uploaded_files[i] for i in done]
+            probs = np.array([[cached[i][label] for label in classifier.labels] for i in done]).reshape(-1, len(classifier.labels))
+            damaged, intact = split_scores_batch(probs, classifier.labels)
+            duplicates = [None] * len(done)
+            if index is not None and done:
+                similar = remember(
+                    index, np.stack([vectors[i] for i in done]), [hashes[i] for i in done],
+                    [f.name for f in uploaded_files], damaged, intact,
+                )
+                duplicates = [duplicate.meta["name"] if duplicate else None for _, duplicate in similar]
+
+        damaged_pct = np.round(damaged * 100).astype(int)
+        intact_pct = np.round(intact * 100).astype(int)
+        results = pd.DataFrame({
+            "filename": [f.name for f in uploaded_files],
+            "DAMAGED %": damaged_pct,
+            "INTACT %": intact_pct,
+            "verdict": verdict_batch(damaged, intact),
+            "duplicate of": duplicates,
+        })
+        new = [
+            row for row, (i, f) in enumerate(zip(done, uploaded_files))
+            if first_inspection("upload-batch", f.file_id, hashes[i])
+        ]
+        metrics.record_verdicts(results["verdict"].iloc[new], source="upload-batch")
+        result_log.record(
+            "upload-batch", damaged[new], intact[new], results["verdict"].iloc[new], [hashes[done[row]] for row in new],
+            classifier.version,
+        )
+        n_damaged = int((results["verdict"] == "DAMAGED").sum())
+        st.metric("Damaged packages", f"{n_damaged} / {len(results)}")
+        st.dataframe(results, use_container_width=True, hide_index=True)
+        if unreadable:
+            st.warning(f"⚠️ {len(unreadable)} file(s) could not be read and were skipped")
+            st.dataframe(pd.DataFrame(unreadable), use_container_width=True, hide_index=True)
 
     else:
         st.info("👆 Upload an image to see prediction results")
 
+with st.sidebar.expander("🚦 Inference front"):
+    st.json(inference_front.status())
+
+with st.sidebar.expander("🧾 Result log"):
+    # Only today's segments are opened; each shift is two binary searches and two column slices
+    today = datetime.combine(date.today(), datetime.min.time())
+    st.dataframe(pd.DataFrame(
+        result_log.damage_rates(today, today + timedelta(days=1)),
+        columns=["shift", "inspections", "damaged", "damage_rate"],
+    ), hide_index=True)
+    st.caption("One row per inspected parcel: uploads, snapshots and HTTP requests (not webcam flips or stream frames)")
+    st.json(result_log.stats)
+
+with st.sidebar.expander("⚡ Prediction cache"):
+    st.json(prediction_cache.report())
+
+with st.sidebar.expander("📈 Metrics"):
+    st.dataframe(pd.DataFrame(
+        [
+            {"stage": dict(key)["stage"], "count": count, "mean ms": round(mean * 1000, 1), "p95 ≤ ms": p95 * 1000}
+            for key, (count, mean, p95) in metrics.stage_seconds.summary().items()
+        ],
+        columns=["stage", "count", "mean ms", "p95 ≤ ms"],
+    ), hide_index=True)
+    st.code(metrics.render(), language="text")
+
 # Footer
 st.markdown("---")
 st.caption("Academic demo • Binary classification: DAMAGED vs INTACT")
+
+# ========================
+# Server stream render loop (last, so the rest of the page renders first)
+# ========================
+pipeline = st.session_state.get("stream_pipeline")
+if pipeline and pipeline.running:
+    last_seq = 0
+    while pipeline.running:
+        result = pipeline.latest()
+        if result is not None and result.seq != last_seq:
+            last_seq = result.seq
+            damaged, intact = split_scores(result.probabilities)
+            frame_view.image(result.frame, use_column_width=True)
+            with result_view.container():
+                st.metric("Live verdict", verdict(damaged, intact), f"{max(damaged, intact):.0%}", delta_color="off")
+                st.progress(damaged, text=f"DAMAGED {damaged:.0%}")
+                st.progress(intact, text=f"INTACT {intact:.0%}")
+                st.caption(f"latency {result.latency * 1000:.0f} ms • {pipeline.stats}")
+        time.sleep(0.05)
@@ -0,0 +1,225 @@
+"""Vendored browser assets: TF.js runtime and the Teachable Machine model.
+
+    python damaged-and-intact-packages/assets.py            # download pinned versions into static/
+    python damaged-and-intact-packages/assets.py --model-version e02fec42fdb32ce1   # same weights as that local model
+    ASSETS_PORT=8502 streamlit run damaged-and-intact-packages/app.py
+
+Every file is stored under a content-hashed name (``tf.min.1a2b3c4d5e.js``)
+and listed in ``static/manifest.json``; ``model.json`` is rewritten to point at
+the hashed weight shards. Because a name never changes meaning, the files are
+served with ``Cache-Control: immutable`` and repeat visits load the runtime and
+weights from the browser cache. Set ``ASSETS_PORT`` to serve them from the app
+process; browsers then fetch them from that port on whatever host name they
+opened the app with. Set ``ASSETS_URL`` instead when they are reached under
+another address (a proxy, TLS, or ``server.py``'s ``/static/`` route). Without vendored assets the
+page falls back to the same pinned versions on the CDN.
+
+The browser model is a separate export, so ``threshold.json`` (evaluated for
+a local model version) only applies to it when the manifest records, via
+``--model-version``, that it was exported with those same weights; otherwise
+the browser keeps ``DAMAGED > INTACT``.
+"""
+import argparse
+import hashlib
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+from pathlib import Path
+import threading
+import urllib.parse
+import urllib.request
+
+BASE_DIR = Path(__file__).resolve().parent
+STATIC_DIR = BASE_DIR / "static"
+MANIFEST_NAME = "manifest.json"
+MODEL_VERSION_KEY = "model_version"  # manifest entry that is not a file
+
+# teachablemachine-image 0.8.x is built against tfjs 1.3.x
+TFJS_VERSION = "1.3.1"
+TM_IMAGE_VERSION = "0.8.5"
+RUNTIME_URLS = {
+    "tf.min.js": f"https://cdn.jsdelivr.net/npm/@tensorflow/tfjs@{TFJS_VERSION}/dist/tf.min.js",
+    "teachablemachine-image.min.js": (
+        f"https://cdn.jsdelivr.net/npm/@teachablemachine/image@{TM_IMAGE_VERSION}/dist/teachablemachine-image.min.js"
+    ),
+}
+TM_MODEL_URL = "https://teachablemachine.withgoogle.com/models/XPTjPjJOe/"
+
+ASSETS_PORT = os.environ.get("ASSETS_PORT")
+ASSETS_URL = os.environ.get("ASSETS_URL")
+IMMUTABLE = "public, max-age=31536000, immutable"
+CONTENT_TYPES = {".js": "application/javascript", ".json": "application/json", ".bin": "application/octet-stream"}
+
+
+def hashed_name(name, data):
+    """``tf.min.js`` -> ``tf.min.<10 hex digits>.js``."""
+    stem, suffix = os.path.splitext(name)
+    return f"{stem}.{hashlib.blake2b(data, digest_size=5).hexdigest()}{suffix}"
+
+
+def fetch(url, timeout=60):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read()
+
+
+def vendor(static_dir=STATIC_DIR, model_url=TM_MODEL_URL, model_version=None):
+    """Download the runtime and model into ``static_dir``; returns the manifest.
+
+    ``model_version`` is the local model version the browser model was exported with, if known.
+    """
+    static_dir = Path(static_dir)
+    static_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+
+    def store(name, data):
+        manifest[name] = hashed_name(name, data)
+        (static_dir / manifest[name]).write_bytes(data)
+
+    for name, url in RUNTIME_URLS.items():
+        store(name, fetch(url))
+
+    topology = json.loads(fetch(urllib.parse.urljoin(model_url, "model.json")))
+    for group in topology.get("weightsManifest", []):
+        shards = []
+        for path in group["paths"]:
+            data = fetch(urllib.parse.urljoin(model_url, path))
+            shards.append(hashed_name(os.path.basename(path), data))
+            (static_dir / shards[-1]).write_bytes(data)
+        group["paths"] = shards  # resolved relative to model.json, which sits next to them
+    store("model.json", json.dumps(topology, separators=(",", ":")).encode())
+    store("metadata.json", fetch(urllib.parse.urljoin(model_url, "metadata.json")))
+    if model_version:
+        manifest[MODEL_VERSION_KEY] = model_version
+
+    keep = set(manifest.values()) | {
+        path for group in topology.get("weightsManifest", []) for path in group["paths"]
+    }
+    for stale in static_dir.iterdir():
+        if stale.name not in keep and stale.name != MANIFEST_NAME:
+            stale.unlink()
+    (static_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2) + "\n")
+    return manifest
+
+
+def load_manifest(static_dir=STATIC_DIR):
+    try:
+        return json.loads((Path(static_dir) / MANIFEST_NAME).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def _served_manifest(base_url=None):
+    """(manifest, base URL) when vendored files exist and a route serves them, else (None, None)."""
+    if base_url is None:
+        # With only a port, host-relative URLs: the panel resolves them against the host the browser
+        # reached the app on (``localhost`` would point every dock station at itself)
+        base_url = ASSETS_URL or ("/static/" if ASSETS_PORT else None)
+    manifest = load_manifest()
+    return (manifest, base_url) if manifest and base_url else (None, None)
+
+
+def asset_urls(base_url=None):
+    """Browser URLs for the runtime scripts and model files.
+
+    Vendored, hashed files under ``base_url`` when they exist and a route
+    serves them; otherwise the pinned CDN builds and the hosted model.
+    """
+    manifest, base_url = _served_manifest(base_url)
+    if manifest:
+        return {
+            name: urllib.parse.urljoin(base_url, hashed)
+            for name, hashed in manifest.items() if name != MODEL_VERSION_KEY
+        }
+    return {
+        **RUNTIME_URLS,
+        "model.json": urllib.parse.urljoin(TM_MODEL_URL, "model.json"),
+        "metadata.json": urllib.parse.urljoin(TM_MODEL_URL, "metadata.json"),
+    }
+
+
+def browser_model_version(base_url=None):
+    """Local model version the browser's model was exported with, or None if unknown (or the hosted model)."""
+    manifest, _ = _served_manifest(base_url)
+    return manifest.get(MODEL_VERSION_KEY) if manifest else None
+
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+def read_static(name, static_dir=STATIC_DIR):
+    """(bytes, content type) for a vendored file, or None; only plain hashed names are served."""
+    if "/" in name or "\\" in name or name.startswith(".") or name == MANIFEST_NAME:
+        return None
+    with _files_lock:
+        if name not in _files:
+            path = Path(static_dir) / name
+            if not path.is_file():
+                return None
+            _files[name] = (path.read_bytes(), CONTENT_TYPES.get(path.suffix, "application/octet-stream"))
+        return _files[name]
+
+
+def send_static(handler, name):
+    """Answer ``GET /static/<name>`` on a ``BaseHTTPRequestHandler`` with immutable caching."""
+    found = read_static(name)
+    if found is None:
+        handler.send_error(404)
+        return
+    body, content_type = found
+    handler.send_response(200)
+    handler.send_header("Content-Type", content_type)
+    handler.send_header("Content-Length", str(len(body)))
+    handler.send_header("Cache-Control", IMMUTABLE)
+    handler.send_header("Access-Control-Allow-Origin", "*")  # the component iframes fetch model.json
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+class StaticHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if not path.startswith("/static/"):
+            self.send_error(404)
+            return
+        send_static(self, path[len("/static/"):])
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port=ASSETS_PORT, host="0.0.0.0"):
+    """Serve ``/static/`` on a daemon thread (once per process); no-op without a port."""
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), StaticHandler)
+            threading.Thread(target=_server.serve_forever, name="assets-http", daemon=True).start()
+    return _server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vendor the TF.js runtime and model with content-hashed names.")
+    parser.add_argument("--model-url", default=TM_MODEL_URL, help="Teachable Machine model folder URL")
+    parser.add_argument("--static-dir", default=STATIC_DIR)
+    parser.add_argument("--model-version", help="local model version exported with the same weights "
+                        "(lets the browser use threshold.json evaluated for it)")
+    args = parser.parse_args(argv)
+
+    manifest = vendor(args.static_dir, args.model_url, args.model_version)
+    for name, hashed in manifest.items():
+        if name == MODEL_VERSION_KEY:
+            print(f"{name:32s} = {hashed}")
+            continue
+        size = (Path(args.static_dir) / hashed).stat().st_size
+        print(f"{name:32s} -> {hashed} ({size / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Async inference front: bounded concurrency and a fast "busy" answer under load.
+
+    probs = inference_front.run(fn, image, data)              # from Streamlit / handler threads
+    probs = await asyncio.wrap_future(inference_front.submit(fn, image, data))
+
+CPU-bound work (decode + inference) runs on a sized thread pool driven by an
+asyncio loop on its own thread. At most ``max_in_flight`` jobs hold a slot
+(an ``asyncio.Semaphore``) and at most ``max_waiting`` more queue for one;
+anything beyond that raises :class:`Busy` immediately instead of piling up,
+so latency and the memory held by admitted uploads stay bounded.
+
+Sizes come from ``FRONT_MAX_IN_FLIGHT`` (default: CPU count) and
+``FRONT_MAX_WAITING`` (default 16).
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+import metrics
+
+MAX_IN_FLIGHT = int(os.environ.get("FRONT_MAX_IN_FLIGHT") or os.cpu_count() or 4)
+MAX_WAITING = int(os.environ.get("FRONT_MAX_WAITING", "16"))
+
+
+class Busy(RuntimeError):
+    """Raised when every slot is taken and the waiting line is full."""
+
+    def __init__(self, waiting):
+        super().__init__(f"inference is busy ({waiting} requests waiting)")
+        self.waiting = waiting
+
+
+class InferenceFront:
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, max_waiting=MAX_WAITING):
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self._admitted = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_in_flight, thread_name_prefix="inference-front")
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="inference-front-loop", daemon=True).start()
+        self._semaphore = asyncio.run_coroutine_threadsafe(self._make_semaphore(), self._loop).result()
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.max_in_flight)
+
+    def status(self):
+        with self._lock:
+            admitted = self._admitted
+        return {
+            "in_flight": min(admitted, self.max_in_flight),
+            "waiting": max(admitted - self.max_in_flight, 0),
+            "max_in_flight": self.max_in_flight,
+            "max_waiting": self.max_waiting,
+        }
+
+    def full(self):
+        with self._lock:
+            return self._admitted >= self.max_in_flight + self.max_waiting
+
+    def _admit(self):
+        """Take a place in line; returns the queue position (0 = runs right away)."""
+        with self._lock:
+            waiting = self._admitted - self.max_in_flight
+            if waiting >= self.max_waiting:
+                metrics.front_requests.inc(outcome="busy")
+                raise Busy(waiting)
+            self._admitted += 1
+        metrics.front_requests.inc(outcome="queued" if waiting >= 0 else "accepted")
+        return max(waiting + 1, 0)
+
+    def _release(self):
+        with self._lock:
+            self._admitted -= 1
+
+    async def _run(self, fn, args):
+        try:
+            async with self._semaphore:
+                return await self._loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._release()
+
+    def submit(self, fn, *args):
+        """Schedule ``fn(*args)``; returns a concurrent Future or raises :class:`Busy`."""
+        self._admit()
+        return asyncio.run_coroutine_threadsafe(self._run(fn, args), self._loop)
+
+    def run(self, fn, *args, timeout=None, on_queued=None):
+        """Blocking :meth:`submit`; ``on_queued(position)`` is called if the job has to wait."""
+        position = self._admit()
+        future = asyncio.run_coroutine_threadsafe(self._run(fn, args), self._loop)
+        if position and on_queued is not None:
+            on_queued(position)
+        return future.result(timeout)
+
+
+inference_front = InferenceFront()
@@ -0,0 +1,77 @@
+"""Dynamic micro-batching: merge concurrent single-image requests into batches.
+
+Callers submit one prepared (224, 224, 3) image and get a Future back. A
+single worker thread takes the first waiting image, keeps collecting until
+``max_batch_size`` images are queued or ``max_wait`` seconds have passed, and
+runs them through the model in one forward pass.
+"""
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+import numpy as np
+
+from inference import get_classifier
+import metrics
+
+
+class MicroBatcher:
+    def __init__(self, max_batch_size=32, max_wait=0.005, classifier_getter=get_classifier):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.classifier_getter = classifier_getter
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, pixels):
+        """Queue one (224, 224, 3) uint8 image; the Future resolves to ``{label: probability}``."""
+        future = Future()
+        self._queue.put((pixels, future))
+        return future
+
+    def predict(self, pixels, timeout=None):
+        return self.submit(pixels).result(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        """Block for the first item, then gather more until the batch is full or the deadline passes."""
+        first = self._queue.get()
+        if first is None:
+            return None
+        items = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # finish this batch, stop on the next round
+                break
+            items.append(item)
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            if items is None:
+                return
+            items = [(pixels, future) for pixels, future in items if future.set_running_or_notify_cancel()]
+            if not items:
+                continue
+            metrics.batch_sizes.observe(len(items))
+            try:
+                classifier = self.classifier_getter()
+                probs = classifier.predict_batch(np.stack([pixels for pixels, _ in items]))
+            except Exception as error:
+                for _, future in items:
+                    future.set_exception(error)
+                continue
+            for (_, future), row in zip(items, probs):
+                future.set_result({label: float(p) for label, p in zip(classifier.labels, row)})
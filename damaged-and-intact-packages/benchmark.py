@@ -0,0 +1,205 @@
+"""Offline latency / throughput benchmark for the inference path.
+
+    python damaged-and-intact-packages/benchmark.py -o bench.json
+    python damaged-and-intact-packages/benchmark.py --images samples/ --compare bench.json
+
+Per-stage latency (decode at reduced JPEG resolution, preprocess = crop +
+resize + [-1, 1] normalization into a reused buffer, inference, postprocess)
+is measured image by image and reported as p50 / p95 / p99. End-to-end
+throughput is measured for every combination of ``--batch-sizes`` and
+``--workers`` (decode processes, as in score.py). Results, peak RSS and
+the run environment are written as JSON so runs can be diffed across commits.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from inference import get_classifier, model_cache, split_scores_batch, verdict
+from preprocess import INPUT_SIZE, decode, prepare_image
+from score import batched, bounded_map, iter_images
+
+STAGES = ("decode", "preprocess", "inference", "postprocess")
+
+
+def synthetic_jpegs(count, size, seed=0):
+    """Deterministic JPEG bytes: smooth gradients plus noise, like a photo compresses."""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    ys, xs = np.mgrid[0:height, 0:width]
+    images = []
+    for _ in range(count):
+        base = (xs * rng.uniform(0.02, 0.2) + ys * rng.uniform(0.02, 0.2)) % 256
+        pixels = np.clip(base[..., None] + rng.normal(0, 12, (height, width, 3)), 0, 255).astype(np.uint8)
+        buffered = BytesIO()
+        Image.fromarray(pixels).save(buffered, format="JPEG", quality=90)
+        images.append(buffered.getvalue())
+    return images
+
+
+def load_images(folder, limit):
+    paths = [path for path, _ in zip(iter_images([folder]), range(limit))]
+    return [open(path, "rb").read() for path in paths]
+
+
+def percentiles(samples_s):
+    ms = np.asarray(samples_s) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+def stage_latencies(classifier, images, repeat):
+    """Time each stage separately for single images."""
+    timings = {stage: [] for stage in STAGES}
+    clock = time.perf_counter
+    buffer = np.empty((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+    for _ in range(repeat):
+        for data in images:
+            t0 = clock()
+            image = decode(Image.open(BytesIO(data)))
+            t1 = clock()
+            pixels = prepare_image(image, out=buffer[0])[None]
+            t2 = clock()
+            probs = classifier.predict_batch(pixels)
+            t3 = clock()
+            damaged, intact = split_scores_batch(probs, classifier.labels)
+            verdict(damaged[0], intact[0])
+            t4 = clock()
+            timings["decode"].append(t1 - t0)
+            timings["preprocess"].append(t2 - t1)
+            timings["inference"].append(t3 - t2)
+            timings["postprocess"].append(t4 - t3)
+    return {stage: percentiles(samples) for stage, samples in timings.items()}
+
+
+def decode_bytes(data):
+    with Image.open(BytesIO(data)) as image:
+        return prepare_image(image)
+
+
+def throughput(classifier, images, batch_size, workers):
+    """End-to-end images/sec: decode in ``workers`` processes (0 = inline), batched inference."""
+    start = time.perf_counter()
+    if workers:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            pool.submit(int).result()  # exclude worker start-up from the measurement
+            start = time.perf_counter()
+            decoded = bounded_map(pool, decode_bytes, images, window=2 * batch_size)
+            for batch in batched(decoded, batch_size):
+                split_scores_batch(classifier.predict_batch(np.stack(batch)), classifier.labels)
+    else:
+        for batch in batched(images, batch_size):
+            pixels = np.stack([decode_bytes(data) for data in batch])
+            split_scores_batch(classifier.predict_batch(pixels), classifier.labels)
+    return len(images) / (time.perf_counter() - start)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its (finished) children, in MB."""
+    scale = 1 / 1024 if sys.platform != "darwin" else 1 / 1024 / 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return round(own, 1), round(children, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    """Print per-metric change against a previous results file."""
+    print(f"\ncompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for stage in STAGES:
+        old, new = baseline["stages"].get(stage), current["stages"][stage]
+        if old:
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+                print(f"  {stage:<12}{key:<8}{old[key]:>9.2f} -> {new[key]:>9.2f} ms ({change:+.1f}%)")
+    old_tp = {(r["batch_size"], r["workers"]): r["images_per_sec"] for r in baseline.get("throughput", [])}
+    for row in current["throughput"]:
+        old = old_tp.get((row["batch_size"], row["workers"]))
+        if old:
+            print(f"  batch={row['batch_size']:<4} workers={row['workers']:<3}"
+                  f"{old:>9.1f} -> {row['images_per_sec']:>9.1f} img/s ({(row['images_per_sec'] / old - 1) * 100:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark decode / preprocess / inference / postprocess.")
+    parser.add_argument("--images", help="folder of sample images (default: synthetic JPEGs)")
+    parser.add_argument("--count", type=int, default=64, help="number of images")
+    parser.add_argument("--size", type=int, nargs=2, default=(1920, 1080), metavar=("W", "H"),
+                        help="synthetic image size")
+    parser.add_argument("--repeat", type=int, default=2, help="passes over the images for stage latency")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4])
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    # Before the model loads: a forked git child would otherwise report our RSS as its own
+    commit = git_commit()
+    images = load_images(args.images, args.count) if args.images else synthetic_jpegs(args.count, args.size)
+    classifier = get_classifier()
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "backend": model_cache.stats["backend"],
+        "model_version": classifier.version,
+        "images": args.images or f"synthetic {args.size[0]}x{args.size[1]} JPEG",
+        "count": len(images),
+        "model_load_seconds": round(model_cache.stats["load_seconds"], 3),
+        "stages": stage_latencies(classifier, images, args.repeat),
+        "throughput": [],
+    }
+    print(f"{'stage':<12}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for stage, row in results["stages"].items():
+        print(f"{stage:<12}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}")
+
+    print(f"\n{'batch':>6}{'workers':>9}{'img/s':>10}")
+    for batch_size in args.batch_sizes:
+        for workers in args.workers:
+            rate = throughput(classifier, images, batch_size, workers)
+            results["throughput"].append(
+                {"batch_size": batch_size, "workers": workers, "images_per_sec": round(rate, 2)}
+            )
+            print(f"{batch_size:>6}{workers:>9}{rate:>10.1f}")
+
+    results["peak_rss_mb"], results["peak_child_rss_mb"] = peak_rss_mb()
+    print(f"\npeak RSS {results['peak_rss_mb']} MB (decode workers {results['peak_child_rss_mb']} MB)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
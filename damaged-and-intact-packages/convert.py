@@ -0,0 +1,124 @@
+"""Convert the float32 checkpoint into TFLite variants and report the trade-offs.
+
+    python damaged-and-intact-packages/convert.py --calibration samples/ --eval labeled/
+
+Writes ``model_float32.tflite``, ``model_float16.tflite`` and
+``model_int8.tflite`` next to ``model.savedmodel`` plus ``model_variants.json``
+with each variant's file size, load time, latency and its accuracy delta
+against the float32 TensorFlow model. Select one at runtime with
+``MODEL_BACKEND=tflite MODEL_VARIANT=int8``.
+
+Without ``--calibration`` / ``--eval`` folders synthetic images are used,
+which is fine for a smoke test but gives a poorly calibrated int8 model.
+"""
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+
+from inference import (
+    BASE_DIR, TFLITE_VARIANTS, PackageClassifier, TFLiteClassifier, normalize, split_scores_batch, tflite_path,
+)
+from dataset import ImageStore, is_store
+from preprocess import INPUT_SIZE
+from score import iter_images, load_pixels
+
+REPORT_PATH = BASE_DIR / "model_variants.json"
+
+
+def load_samples(folder, limit):
+    """Up to ``limit`` prepared images from ``folder`` (or a dataset.py store), or synthetic ones if no folder."""
+    if folder is None:
+        rng = np.random.default_rng(0)
+        return rng.integers(0, 256, (limit, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8)
+    if is_store(folder):
+        return ImageStore(folder).pixels[:limit]
+    decoded = (pixels for _, pixels in map(load_pixels, iter_images([folder])) if isinstance(pixels, np.ndarray))
+    images = list(itertools.islice(decoded, limit))
+    if not images:
+        raise SystemExit(f"no readable images found in {folder}")
+    return np.stack(images)
+
+
+def convert(model, variant, calibration):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        # Integer weights and activations; float32 input/output keeps the interface unchanged
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([normalize(image[None])] for image in calibration)
+    return converter.convert()
+
+
+def measure(classifier, samples, batch_size):
+    start = time.perf_counter()
+    probs = classifier.predict_many(samples, batch_size=batch_size)
+    return probs, (time.perf_counter() - start) / len(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create TFLite variants of the bundled model.")
+    parser.add_argument("--calibration", help="folder or store of representative images for int8 calibration")
+    parser.add_argument("--eval", help="folder or store of images to compare variants on")
+    parser.add_argument("--samples", type=int, default=200, help="max images per folder")
+    parser.add_argument("--batch-size", type=int, default=1, help="batch size for latency measurement")
+    parser.add_argument("--variants", nargs="+", default=list(TFLITE_VARIANTS), choices=TFLITE_VARIANTS)
+    args = parser.parse_args(argv)
+
+    calibration = load_samples(args.calibration, args.samples)
+    eval_set = load_samples(args.eval, args.samples) if args.eval else calibration
+
+    start = time.perf_counter()
+    reference = PackageClassifier()
+    reference.predict_batch(eval_set[:1])
+    load_seconds = time.perf_counter() - start
+    ref_probs, ref_latency = measure(reference, eval_set, args.batch_size)
+    ref_damaged, ref_intact = split_scores_batch(ref_probs, reference.labels)
+    ref_verdicts = ref_damaged > ref_intact
+
+    report = {
+        "eval_images": "synthetic" if args.eval is None and args.calibration is None else len(eval_set),
+        "variants": {
+            "tf-float32": {
+                "size_bytes": sum(f.stat().st_size for f in (BASE_DIR / "model.savedmodel").rglob("*") if f.is_file()),
+                "load_seconds": round(load_seconds, 3),
+                "latency_ms": round(ref_latency * 1000, 3),
+            },
+        },
+    }
+    for variant in args.variants:
+        path = tflite_path(variant)
+        path.write_bytes(convert(reference.model, variant, calibration))
+
+        start = time.perf_counter()
+        classifier = TFLiteClassifier(path)
+        classifier.predict_batch(eval_set[:1])
+        load_seconds = time.perf_counter() - start
+        probs, latency = measure(classifier, eval_set, args.batch_size)
+        damaged, intact = split_scores_batch(probs, classifier.labels)
+        report["variants"][f"tflite-{variant}"] = {
+            "path": path.name,
+            "size_bytes": path.stat().st_size,
+            "load_seconds": round(load_seconds, 3),
+            "latency_ms": round(latency * 1000, 3),
+            "max_abs_prob_delta": round(float(np.abs(probs - ref_probs).max()), 6),
+            "mean_abs_prob_delta": round(float(np.abs(probs - ref_probs).mean()), 6),
+            "verdict_agreement": round(float(((damaged > intact) == ref_verdicts).mean()), 4),
+        }
+
+    REPORT_PATH.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"{'variant':<16}{'size':>10}{'load s':>9}{'ms/img':>9}{'max Δp':>10}{'agree':>8}")
+    for name, row in report["variants"].items():
+        print(f"{name:<16}{row['size_bytes'] / 1e6:>8.2f}MB{row['load_seconds']:>9.2f}{row['latency_ms']:>9.2f}"
+              f"{row.get('max_abs_prob_delta', 0):>10.4f}{row.get('verdict_agreement', 1):>8.1%}")
+    print(f"report -> {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
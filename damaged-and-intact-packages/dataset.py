@@ -0,0 +1,114 @@
+"""Memory-mapped store of preprocessed images for fast re-scoring and evaluation.
+
+    python damaged-and-intact-packages/dataset.py archive/ -o archive.store --workers 8
+    python damaged-and-intact-packages/score.py archive.store -o rescored.csv
+
+Decodes a folder once into ``pixels.npy`` (N, 224, 224, 3) uint8 plus
+``labels.npy`` (class index from ``labels.txt``, -1 if unknown), ``paths.txt``
+and ``meta.json``. Ground truth comes from the closest parent folder named
+like a class (``archive/Damaged/0001.jpg`` -> Damaged). Readers map the arrays
+with ``mmap_mode="r"`` and take slices, so re-scoring an archive costs model
+time only, not JPEG decoding.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import sys
+
+import numpy as np
+
+from inference import LABELS_PATH, load_labels
+from preprocess import INPUT_SIZE
+from score import bounded_map, iter_images, load_pixels
+
+META_NAME = "meta.json"
+
+
+def label_for(path, classes):
+    """Index of the nearest parent folder that names a class, or -1."""
+    lookup = {name.lower(): i for i, name in enumerate(classes)}
+    for parent in Path(path).parents:
+        if parent.name.lower() in lookup:
+            return lookup[parent.name.lower()]
+    return -1
+
+
+def is_store(path):
+    return (Path(path) / META_NAME).is_file()
+
+
+def build_store(sources, output, classes, workers=None, size=INPUT_SIZE):
+    """Decode every image under ``sources`` into a store at ``output``; returns (written, failed)."""
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    paths = list(iter_images(sources))
+    pixels = np.lib.format.open_memmap(output / "pixels.npy", mode="w+", dtype=np.uint8,
+                                       shape=(len(paths), size, size, 3))
+    labels = np.full(len(paths), -1, dtype=np.int16)
+    written, failed = [], 0
+    # spawn, not fork: keep the workers light whatever the parent has imported
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for path, result in bounded_map(pool, load_pixels, paths, window=64):
+            if not isinstance(result, np.ndarray):
+                failed += 1
+                print(f"skipping {path}: {result}", file=sys.stderr)
+                continue
+            pixels[len(written)] = result
+            labels[len(written)] = label_for(path, classes)
+            written.append(path)
+    pixels.flush()
+    del pixels
+    # Failed files leave unused rows at the end; readers only look at the first `count`
+    np.save(output / "labels.npy", labels[:len(written)])
+    (output / "paths.txt").write_text("".join(p + "\n" for p in written), encoding="utf-8")
+    (output / META_NAME).write_text(json.dumps(
+        {"count": len(written), "input_size": size, "classes": list(classes)}, indent=2
+    ) + "\n")
+    return len(written), failed
+
+
+class ImageStore:
+    """Read-only view of a store; ``pixels`` is a memory map, slices are zero-copy."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        meta = json.loads((self.path / META_NAME).read_text())
+        self.classes = meta["classes"]
+        self.input_size = meta["input_size"]
+        count = meta["count"]
+        self.pixels = np.load(self.path / "pixels.npy", mmap_mode="r")[:count]
+        self.labels = np.load(self.path / "labels.npy", mmap_mode="r")
+        self.paths = (self.path / "paths.txt").read_text(encoding="utf-8").splitlines()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def batches(self, batch_size, start=0):
+        """Yield ``(start, pixels)`` slices of the memory map."""
+        for offset in range(start, len(self), batch_size):
+            yield offset, self.pixels[offset:offset + batch_size]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preprocess an image archive into a memory-mapped store.")
+    parser.add_argument("sources", nargs="+", help="image directories or glob patterns")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="store directory")
+    parser.add_argument("--labels", default=LABELS_PATH, help="labels.txt with the class names")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="decode processes")
+    args = parser.parse_args(argv)
+
+    classes = load_labels(args.labels)
+    written, failed = build_store(args.sources, args.output, classes, args.workers)
+    labels = ImageStore(args.output).labels
+    counts = ", ".join(f"{name} {int((labels == i).sum())}" for i, name in enumerate(classes))
+    size_mb = (args.output / "pixels.npy").stat().st_size / 1e6
+    print(f"{written} images ({counts}, unlabeled {int((labels < 0).sum())}), {failed} failed, "
+          f"{size_mb:.0f} MB -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Offline evaluation on a labeled set: confusion matrix, PR / ROC and a threshold sweep.
+
+    python damaged-and-intact-packages/evaluate.py labeled/ -o eval.json
+    python damaged-and-intact-packages/evaluate.py archive.store --min-recall 0.95 --save-threshold
+
+Ground truth comes from folder names matching ``labels.txt`` (``labeled/Damaged/``,
+``labeled/Intact/``) or from a ``dataset.py`` store. Images are scored in
+batches and only two float32 scores and a label are kept per image, so tens
+of thousands of images fit in a few hundred KB. All metrics are computed
+vectorized over the DAMAGED probability (DAMAGED is the positive class).
+
+The sweep picks the threshold with the best F1, or with ``--min-recall`` the
+most precise one that still catches that share of damaged parcels.
+``--save-threshold`` writes it to ``threshold.json``, which the app, CLI and
+server then use instead of ``DAMAGED > INTACT`` for as long as they load the
+model version it was evaluated for.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import sys
+
+import numpy as np
+
+from dataset import ImageStore, is_store, label_for
+from inference import THRESHOLD_PATH, get_classifier, split_scores_batch
+from score import batched, bounded_map, iter_images, load_pixels
+
+SWEEP = np.round(np.linspace(0.001, 0.999, 999), 3)  # 0 and 1 would flag everything / nothing
+
+
+def labeled_batches(sources, classes, batch_size, workers):
+    """Yield ``(pixels, class indices)`` batches from stores (zero-copy) and labeled folders."""
+    stores = [ImageStore(source) for source in sources if is_store(source)]
+    folders = [source for source in sources if not is_store(source)]
+    for store in stores:
+        for start, pixels in store.batches(batch_size):
+            yield pixels, np.asarray(store.labels[start:start + len(pixels)])
+    if not folders:
+        return
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        decoded = bounded_map(pool, load_pixels, iter_images(folders), window=2 * batch_size)
+        for batch in batched(decoded, batch_size):
+            good = [(path, pixels) for path, pixels in batch if isinstance(pixels, np.ndarray)]
+            for path, result in batch:
+                if not isinstance(result, np.ndarray):
+                    print(f"skipping {path}: {result}", file=sys.stderr)
+            if good:
+                yield (np.stack([pixels for _, pixels in good]),
+                       np.array([label_for(path, classes) for path, _ in good], dtype=np.int16))
+
+
+def score_labeled(classifier, sources, batch_size=32, workers=None):
+    """(damaged, intact, is_damaged) arrays for every labeled image; unlabeled ones are dropped."""
+    damaged_class = next(i for i, label in enumerate(classifier.labels) if "damage" in label.lower())
+    damaged, intact, truth = [], [], []
+    seen = 0
+    for pixels, labels in labeled_batches(sources, classifier.labels, batch_size, workers):
+        keep = labels >= 0
+        seen += len(labels)
+        if not keep.any():
+            continue
+        d, i = split_scores_batch(classifier.predict_batch(pixels), classifier.labels)
+        damaged.append(d[keep].astype(np.float32))
+        intact.append(i[keep].astype(np.float32))
+        truth.append(labels[keep] == damaged_class)
+        print(f"\rscored {seen} images", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    if not damaged:
+        raise SystemExit("no labeled images found (expected folders named like the classes in labels.txt)")
+    return np.concatenate(damaged), np.concatenate(intact), np.concatenate(truth)
+
+
+def confusion_matrix(is_damaged, predicted_damaged):
+    """2x2 counts, rows = actual (DAMAGED, INTACT), columns = predicted (DAMAGED, INTACT)."""
+    counts = np.bincount(2 * (~is_damaged) + (~predicted_damaged), minlength=4)
+    return counts.reshape(2, 2)
+
+
+def summary(matrix):
+    (tp, fn), (fp, tn) = matrix
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "accuracy": (tp + tn) / matrix.sum(),
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "false_positive_rate": fp / (fp + tn) if fp + tn else 0.0,
+    }
+
+
+def sweep(scores, is_damaged, thresholds=SWEEP):
+    """Precision / recall / F1 / FPR at every threshold (``score >= t`` is DAMAGED), via sorted counts."""
+    positives = np.sort(scores[is_damaged])
+    negatives = np.sort(scores[~is_damaged])
+    tp = len(positives) - np.searchsorted(positives, thresholds, side="left")
+    fp = len(negatives) - np.searchsorted(negatives, thresholds, side="left")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+        recall = tp / max(len(positives), 1)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    fpr = fp / max(len(negatives), 1)
+    return {"threshold": thresholds, "precision": precision, "recall": recall, "f1": f1,
+            "false_positive_rate": fpr}
+
+
+def curves(scores, is_damaged):
+    """Exact ROC AUC and average precision from one sort of the scores."""
+    order = np.argsort(-scores, kind="stable")
+    ranked, hits = scores[order], is_damaged[order]
+    last_of_tie = np.r_[ranked[1:] != ranked[:-1], True]  # one point per distinct score
+    tps = np.cumsum(hits)[last_of_tie]
+    fps = np.cumsum(~hits)[last_of_tie]
+    n_pos, n_neg = max(tps[-1], 1), max(fps[-1], 1)
+    tpr, fpr = np.r_[0, tps / n_pos], np.r_[0, fps / n_neg]
+    precision = tps / (tps + fps)
+    return {
+        "roc_auc": float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)),
+        "average_precision": float(np.sum(np.diff(tpr) * precision)),
+    }
+
+
+def choose_threshold(table, min_recall=None):
+    """Index into the sweep: best F1, or the most precise threshold with recall >= ``min_recall``."""
+    if min_recall is None:
+        return int(np.argmax(table["f1"]))
+    allowed = np.flatnonzero(table["recall"] >= min_recall)
+    if not len(allowed):
+        raise SystemExit(f"no threshold reaches recall {min_recall}")
+    # highest precision; among ties the highest threshold (fewest false alarms)
+    return int(allowed[np.lexsort((table["threshold"][allowed], table["precision"][allowed]))[-1]])
+
+
+def print_matrix(title, matrix):
+    print(f"{title}\n{'':>18}{'pred DAMAGED':>14}{'pred INTACT':>14}")
+    for name, row in zip(("actual DAMAGED", "actual INTACT"), matrix):
+        print(f"{name:>18}{row[0]:>14}{row[1]:>14}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the classifier on a labeled folder or store.")
+    parser.add_argument("sources", nargs="+", help="labeled folders (Damaged/, Intact/) or dataset.py stores")
+    parser.add_argument("-o", "--output", type=Path, help="write the full report and curves as JSON")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="decode processes for folders")
+    parser.add_argument("--min-recall", type=float, help="pick the most precise threshold with this DAMAGED recall")
+    parser.add_argument("--save-threshold", nargs="?", const=THRESHOLD_PATH, type=Path, metavar="PATH",
+                        help=f"save the chosen threshold for the app (default {THRESHOLD_PATH.name})")
+    args = parser.parse_args(argv)
+
+    classifier = get_classifier()
+    damaged, intact, is_damaged = score_labeled(classifier, args.sources, args.batch_size, args.workers)
+
+    default = confusion_matrix(is_damaged, damaged > intact)
+    table = sweep(damaged, is_damaged)
+    best = choose_threshold(table, args.min_recall)
+    threshold = float(table["threshold"][best])
+    chosen = confusion_matrix(is_damaged, damaged >= threshold)
+    report = {
+        "model_version": classifier.version,
+        "images": int(len(damaged)),
+        "damaged": int(is_damaged.sum()),
+        "intact": int((~is_damaged).sum()),
+        **curves(damaged, is_damaged),
+        "default_rule": {"rule": "DAMAGED > INTACT", "confusion": default.tolist(), **summary(default)},
+        "chosen": {
+            "threshold": threshold,
+            "criterion": f"max precision at recall >= {args.min_recall}" if args.min_recall else "max F1",
+            "confusion": chosen.tolist(),
+            **summary(chosen),
+        },
+    }
+
+    print(f"{report['images']} labeled images ({report['damaged']} damaged, {report['intact']} intact), "
+          f"ROC AUC {report['roc_auc']:.4f}, average precision {report['average_precision']:.4f}")
+    for title, matrix, key in (("DAMAGED > INTACT", default, "default_rule"),
+                               (f"DAMAGED >= {threshold:.3f} ({report['chosen']['criterion']})", chosen, "chosen")):
+        print()
+        print_matrix(title, matrix)
+        stats = report[key]
+        print(f"accuracy {stats['accuracy']:.4f}  precision {stats['precision']:.4f}  "
+              f"recall {stats['recall']:.4f}  F1 {stats['f1']:.4f}  FPR {stats['false_positive_rate']:.4f}")
+
+    if args.output:
+        curve_table = {name: np.round(values, 6).tolist() for name, values in table.items()}
+        args.output.write_text(json.dumps({**report, "sweep": curve_table}, indent=2) + "\n")
+        print(f"\nreport -> {args.output}")
+    if args.save_threshold:
+        args.save_threshold.write_text(json.dumps({
+            "threshold": threshold,
+            "criterion": report["chosen"]["criterion"],
+            "precision": report["chosen"]["precision"],
+            "recall": report["chosen"]["recall"],
+            "model_version": classifier.version,
+            "images": report["images"],
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }, indent=2) + "\n")
+        print(f"threshold {threshold:.3f} -> {args.save_threshold}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""Server-side inference for the bundled Teachable Machine classifier.
+
+``model.savedmodel`` only ships the checkpoint variables, so the network is
+rebuilt here (MobileNetV2 alpha=0.35 feature extractor + the Teachable
+Machine dense head) and the weights are restored from the checkpoint.
+Everything runs locally; no network access is needed.
+
+Two backends are available, selected with ``MODEL_BACKEND``:
+
+* ``tf`` (default): full TensorFlow on the float32 checkpoint.
+* ``tflite``: a converted ``model_<MODEL_VARIANT>.tflite`` (float32, float16
+  or int8, see ``convert.py``) on the TFLite interpreter. Uses
+  ``tflite_runtime`` when installed, so TensorFlow is never imported.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+import time
+import warnings
+
+import numpy as np
+
+import metrics
+from preprocess import INPUT_SIZE, normalize
+
+BASE_DIR = Path(__file__).resolve().parent
+MODEL_DIR = BASE_DIR / "model.savedmodel"
+LABELS_PATH = BASE_DIR / "labels.txt"
+BATCH_SIZE = 32
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "tf")
+MODEL_VARIANT = os.environ.get("MODEL_VARIANT", "int8")
+TFLITE_VARIANTS = ("float32", "float16", "int8")
+THRESHOLD_PATH = Path(os.environ.get("THRESHOLD_PATH") or BASE_DIR / "threshold.json")
+
+
+def load_labels(path=LABELS_PATH):
+    """Read ``labels.txt`` ("0 Damaged", "1 Intact", ...) into class names."""
+    labels = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        index, _, name = line.partition(" ")
+        labels.append(name.strip() if index.isdigit() and name else line)
+    return labels
+
+
+def tflite_path(variant):
+    return BASE_DIR / f"model_{variant}.tflite"
+
+
+def model_version(model_dir=MODEL_DIR, labels_path=LABELS_PATH):
+    """Short content fingerprint of the weights and labels.
+
+    ``variables.index`` stores a checksum of every tensor, so hashing it (plus
+    ``labels.txt``) identifies the weights without reading the data shard.
+    A ``.tflite`` file is hashed whole.
+    """
+    model_dir = Path(model_dir)
+    weights = model_dir if model_dir.suffix == ".tflite" else model_dir / "variables" / "variables.index"
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(weights.read_bytes())
+    digest.update(Path(labels_path).read_bytes())
+    return digest.hexdigest()
+
+
+def build_model(num_classes):
+    """Teachable Machine image model: MobileNetV2 0.35 + Dense(100) + Dense(N)."""
+    import tensorflow as tf
+
+    base = tf.keras.applications.MobileNetV2(
+        input_shape=(INPUT_SIZE, INPUT_SIZE, 3),
+        alpha=0.35,
+        include_top=False,
+        weights=None,
+        pooling="avg",
+    )
+    return tf.keras.Sequential([
+        base,
+        tf.keras.layers.Dense(100, activation="relu"),
+        tf.keras.layers.Dense(num_classes, activation="softmax", use_bias=False),
+    ])
+
+
+class Classifier:
+    """Common batching helpers; subclasses implement :meth:`_predict_batch`."""
+
+    backend = None
+    labels = ()
+    embeddings = False  # whether embed_batch() is available
+
+    def predict_batch(self, batch):
+        """Class probabilities for a (N, 224, 224, 3) batch, shape (N, classes).
+
+        Takes uint8 pixels or a float32 batch already normalized by :mod:`preprocess`.
+        """
+        with metrics.span("inference"):
+            probs = self._predict_batch(batch)
+        metrics.images_inferred.inc(len(batch), backend=self.backend)
+        return probs
+
+    def _predict_batch(self, batch):
+        raise NotImplementedError
+
+    def embed_batch(self, batch):
+        """(embeddings, probabilities) from one forward pass; embeddings are the pooled backbone features."""
+        if not self.embeddings:
+            raise NotImplementedError(f"the {self.backend} backend does not expose embeddings")
+        with metrics.span("inference"):
+            result = self._embed_batch(batch)
+        metrics.images_inferred.inc(len(batch), backend=self.backend)
+        return result
+
+    def _embed_batch(self, batch):
+        raise NotImplementedError
+
+    def predict_many(self, pixels, batch_size=BATCH_SIZE):
+        """Probabilities for an (N, 224, 224, 3) uint8 array, one forward pass per chunk."""
+        if len(pixels) == 0:
+            return np.zeros((0, len(self.labels)), dtype=np.float32)
+        return np.concatenate([
+            self.predict_batch(pixels[start:start + batch_size])
+            for start in range(0, len(pixels), batch_size)
+        ])
+
+    def predict(self, pixels):
+        """Per-class probabilities for one (224, 224, 3) image (uint8, or normalized float32)."""
+        probs = self.predict_batch(np.expand_dims(pixels, 0))[0]
+        return {label: float(p) for label, p in zip(self.labels, probs)}
+
+
+class PackageClassifier(Classifier):
+    """Local DAMAGED / INTACT classifier backed by ``model.savedmodel``."""
+
+    backend = "tf"
+    embeddings = True
+
+    def __init__(self, model_dir=MODEL_DIR, labels_path=LABELS_PATH):
+        import tensorflow as tf
+
+        self.model_dir = Path(model_dir)
+        self.labels = load_labels(labels_path)
+        self.version = model_version(model_dir, labels_path)
+        self.model = build_model(len(self.labels))
+        checkpoint = tf.train.Checkpoint(
+            variables=self.model.variables,
+            trainable_variables=self.model.trainable_variables,
+        )
+        checkpoint.read(str(self.model_dir / "variables" / "variables")).assert_existing_objects_matched()
+        signature = [tf.TensorSpec([None, INPUT_SIZE, INPUT_SIZE, 3], tf.float32)]
+        self._forward = tf.function(lambda x: self.model(x, training=False), input_signature=signature)
+        base, hidden, head = self.model.layers
+
+        def embed(x):
+            features = base(x, training=False)  # pooled MobileNetV2 features, (N, 1280)
+            return features, head(hidden(features))
+
+        self._embed = tf.function(embed, input_signature=signature)
+
+    def _predict_batch(self, batch):
+        return self._forward(normalize(batch)).numpy()
+
+    def _embed_batch(self, batch):
+        features, probs = self._embed(normalize(batch))
+        return features.numpy(), probs.numpy()
+
+
+def tflite_interpreter(path, num_threads=None):
+    """TFLite interpreter from ``tflite_runtime`` if available, else from TensorFlow."""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=str(path), num_threads=num_threads)
+
+
+class TFLiteClassifier(Classifier):
+    """Same interface as :class:`PackageClassifier`, backed by a ``.tflite`` file."""
+
+    backend = "tflite"
+
+    def __init__(self, model_path, labels_path=LABELS_PATH, num_threads=None):
+        self.model_path = Path(model_path)
+        if not self.model_path.exists():
+            raise FileNotFoundError(f"{self.model_path} not found; run convert.py to create it")
+        self.labels = load_labels(labels_path)
+        self.version = model_version(self.model_path, labels_path)
+        self.interpreter = tflite_interpreter(self.model_path, num_threads)
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = None
+        self._lock = threading.Lock()  # interpreters are not thread-safe
+
+    def _resize(self, n):
+        if n != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input["index"], [n, INPUT_SIZE, INPUT_SIZE, 3])
+            self.interpreter.allocate_tensors()
+            self._batch_size = n
+
+    def _predict_batch(self, batch):
+        x = normalize(batch)
+        if self._input["dtype"] != np.float32:  # fully-quantized input
+            scale, zero_point = self._input["quantization"]
+            x = np.round(x / scale + zero_point).astype(self._input["dtype"])
+        with self._lock:
+            self._resize(len(x))
+            self.interpreter.set_tensor(self._input["index"], x)
+            self.interpreter.invoke()
+            y = self.interpreter.get_tensor(self._output["index"])
+        if self._output["dtype"] != np.float32:
+            scale, zero_point = self._output["quantization"]
+            y = (y.astype(np.float32) - zero_point) * scale
+        return y
+
+
+def load_classifier(backend=MODEL_BACKEND, variant=MODEL_VARIANT, num_threads=None):
+    """``num_threads`` sizes the TFLite interpreter; TensorFlow's pools are process-wide (see prefork.py)."""
+    if backend == "tf":
+        return PackageClassifier()
+    if backend == "tflite":
+        return TFLiteClassifier(tflite_path(variant), num_threads=num_threads)
+    raise ValueError(f"Unknown MODEL_BACKEND {backend!r} (expected 'tf' or 'tflite')")
+
+
+def split_scores(probabilities):
+    """Collapse per-class probabilities into (damaged, intact) like the web UI does."""
+    damaged = intact = 0.0
+    for label, p in probabilities.items():
+        if "damage" in label.lower():
+            damaged = max(damaged, p)
+        else:
+            intact = max(intact, p)
+    return damaged, intact
+
+
+def split_scores_batch(probs, labels):
+    """Vectorized :func:`split_scores` for an (N, classes) array -> (damaged, intact)."""
+    probs = np.asarray(probs)
+    is_damage = np.array(["damage" in label.lower() for label in labels])
+    damaged = probs[:, is_damage].max(axis=1) if is_damage.any() else np.zeros(len(probs))
+    intact = probs[:, ~is_damage].max(axis=1) if (~is_damage).any() else np.zeros(len(probs))
+    return damaged, intact
+
+
+def load_threshold(path=THRESHOLD_PATH, model_version=None, strict=False):
+    """Operating threshold on the DAMAGED probability saved by ``evaluate.py``, or None.
+
+    A threshold evaluated for other weights than ``model_version``, or an
+    unreadable file, is ignored with a warning: verdicts fall back to
+    DAMAGED > INTACT rather than applying a stale operating point. ``strict``
+    also ignores files that do not record a model version.
+    """
+    try:
+        saved = json.loads(Path(path).read_text())
+        threshold = float(saved["threshold"])
+    except FileNotFoundError:
+        return None
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as error:
+        warnings.warn(f"ignoring {path}: {type(error).__name__}: {error}")
+        return None
+    saved_version = saved.get("model_version")
+    if model_version is not None and saved_version != model_version and (saved_version is not None or strict):
+        warnings.warn(
+            f"ignoring {path}: evaluated for model {saved_version}, loaded model is {model_version}; "
+            "re-run evaluate.py --save-threshold"
+        )
+        return None
+    return threshold
+
+
+def verdict(damaged, intact, threshold=None):
+    """DAMAGED if ``damaged`` reaches the loaded model's threshold; without one, if it beats ``intact``."""
+    threshold = model_cache.threshold if threshold is None else threshold
+    if threshold is None:
+        return "DAMAGED" if damaged > intact else "INTACT"
+    return "DAMAGED" if damaged >= threshold else "INTACT"
+
+
+def verdict_batch(damaged, intact, threshold=None):
+    """Vectorized :func:`verdict` -> array of "DAMAGED" / "INTACT"."""
+    threshold = model_cache.threshold if threshold is None else threshold
+    damaged = np.asarray(damaged)
+    is_damaged = damaged > np.asarray(intact) if threshold is None else damaged >= threshold
+    return np.where(is_damaged, "DAMAGED", "INTACT")
+
+
+def model_fingerprint(*paths):
+    """(name, size, mtime) of every model file; changes whenever the files do."""
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.rglob("*")) if path.is_dir() else [path])
+    return tuple(
+        (str(f), stat.st_size, stat.st_mtime_ns)
+        for f in files if f.is_file()
+        for stat in [f.stat()]
+    )
+
+
+class ModelCache:
+    """Process-wide classifier shared by every Streamlit session and rerun.
+
+    The model is loaded and warmed up once, and only reloaded when its files
+    (or ``labels.txt``) change on disk. ``threshold`` follows the loaded
+    weights: ``threshold.json`` is re-read after every reload and whenever the
+    file itself changes, and only applies if it was evaluated for that model.
+    """
+
+    def __init__(self, backend=MODEL_BACKEND, variant=MODEL_VARIANT):
+        self.backend = backend
+        self.variant = variant
+        self.paths = (MODEL_DIR if backend == "tf" else tflite_path(variant), LABELS_PATH)
+        self.num_threads = None  # TFLite interpreter threads; None lets the runtime decide
+        self._classifier = None
+        self._fingerprint = None
+        self.threshold = None
+        self._threshold_fingerprint = None
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+        self.stats = {
+            "backend": backend if backend == "tf" else f"{backend}-{variant}",
+            "hits": 0, "misses": 0, "reloads": 0, "load_seconds": 0.0, "warmup_seconds": 0.0, "threshold": None,
+        }
+
+    def get(self):
+        fingerprint = model_fingerprint(*self.paths)
+        classifier = self._classifier
+        if classifier is not None and fingerprint == self._fingerprint:
+            self.stats["hits"] += 1
+            metrics.cache_lookups.inc(cache="model", result="hit")
+            self._refresh_threshold(classifier)
+            return classifier
+        with self._lock:
+            if self._classifier is not None and fingerprint == self._fingerprint:
+                self.stats["hits"] += 1
+                metrics.cache_lookups.inc(cache="model", result="hit")
+                self._refresh_threshold(self._classifier)
+                return self._classifier
+            self.stats["misses"] += 1
+            metrics.cache_lookups.inc(cache="model", result="miss")
+            if self._classifier is not None:
+                self.stats["reloads"] += 1
+            classifier = self._load()
+            self._refresh_threshold(classifier)
+            self._classifier = classifier
+            self._fingerprint = fingerprint
+            return classifier
+
+    def _refresh_threshold(self, classifier):
+        fingerprint = (classifier.version, model_fingerprint(THRESHOLD_PATH))
+        if fingerprint != self._threshold_fingerprint:
+            self._threshold_fingerprint = fingerprint
+            self.threshold = load_threshold(THRESHOLD_PATH, classifier.version)
+            self.stats["threshold"] = self.threshold
+
+    def warm_up_in_background(self):
+        """Start loading + warming up on a daemon thread; callers of :meth:`get` wait on it."""
+        with self._lock:
+            if self._warmup_thread is None:
+                self._warmup_thread = threading.Thread(target=self.get, name="model-warmup", daemon=True)
+                self._warmup_thread.start()
+        return self._warmup_thread
+
+    @property
+    def loaded(self):
+        return self._classifier is not None
+
+    def _load(self):
+        start = time.perf_counter()
+        with metrics.span("model_load"):
+            classifier = load_classifier(self.backend, self.variant, self.num_threads)
+        metrics.model_loads.inc(backend=self.stats["backend"])
+        self.stats["load_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        warmup = np.zeros((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8)
+        classifier.predict_batch(warmup)
+        if classifier.embeddings:
+            classifier.embed_batch(warmup)
+        self.stats["warmup_seconds"] = time.perf_counter() - start
+        return classifier
+
+
+model_cache = ModelCache()
+
+
+def get_classifier():
+    """Process-wide classifier, loaded and warmed up on first use."""
+    return model_cache.get()
@@ -0,0 +1,104 @@
+"""Stateful live scoring: skip unchanged frames, smooth the verdict over time.
+
+:class:`ChangeGate` compares a tiny grayscale thumbnail of each frame with
+the last one that was actually scored and skips inference while the scene is
+static. :class:`VerdictSmoother` keeps an exponential moving average of the
+class probabilities so the displayed verdict does not flicker; skipped frames
+feed it the last raw scores again, so it settles on a parcel that stopped
+mid-transition instead of freezing between the old and the new one.
+"""
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import metrics
+from preprocess import prepare_image
+
+GATE_SIZE = 32
+
+
+class ChangeGate:
+    """Frame-difference gate on a (size x size) grayscale thumbnail.
+
+    ``threshold`` is the mean absolute pixel difference (0-255) that counts as
+    a change; ``max_age`` forces a re-score every so many seconds anyway.
+    """
+
+    def __init__(self, threshold=6.0, max_age=5.0, size=GATE_SIZE):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.size = size
+        self._reference = None
+        self._reference_at = 0.0
+
+    def thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        return cv2.resize(gray, (self.size, self.size), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def changed(self, frame, now=None):
+        """True if ``frame`` should be scored; the frame then becomes the new reference."""
+        now = time.monotonic() if now is None else now
+        thumb = self.thumbnail(frame)
+        if (
+            self._reference is None
+            or now - self._reference_at >= self.max_age
+            or np.abs(thumb - self._reference).mean() >= self.threshold
+        ):
+            self._reference = thumb
+            self._reference_at = now
+            return True
+        return False
+
+    def reset(self):
+        self._reference = None
+
+
+class VerdictSmoother:
+    """Exponential moving average over per-class probabilities."""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self._state = None
+
+    def update(self, probabilities):
+        if self._state is None or self.alpha >= 1:
+            self._state = dict(probabilities)
+        else:
+            self._state = {
+                label: self.alpha * p + (1 - self.alpha) * self._state.get(label, p)
+                for label, p in probabilities.items()
+            }
+        return self._state
+
+    def reset(self):
+        self._state = None
+
+
+class LiveScorer:
+    """Gate + classifier + smoother for a stream of RGB frames."""
+
+    def __init__(self, classifier, gate=None, smoother=None):
+        self.classifier = classifier
+        self.gate = gate or ChangeGate()
+        self.smoother = smoother or VerdictSmoother()
+        self.smoothed = None
+        self._last_raw = None
+        self.stats = {"frames": 0, "inferred": 0, "skipped": 0}
+
+    def score(self, frame):
+        """Smoothed probabilities for ``frame`` and whether the model actually ran."""
+        self.stats["frames"] += 1
+        if self.smoothed is not None and not self.gate.changed(frame):
+            self.stats["skipped"] += 1
+            metrics.stream_frames.inc(outcome="skipped")
+            self.smoothed = self.smoother.update(self._last_raw)  # unchanged scene: keep converging on its scores
+            return self.smoothed, False
+        if self.smoothed is None:
+            self.gate.changed(frame)
+        self._last_raw = self.classifier.predict(prepare_image(Image.fromarray(frame)))
+        self.smoothed = self.smoother.update(self._last_raw)
+        self.stats["inferred"] += 1
+        metrics.stream_frames.inc(outcome="inferred")
+        return self.smoothed, True
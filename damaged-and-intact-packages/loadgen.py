@@ -0,0 +1,79 @@
+"""Load generator for server.py: N concurrent "cameras" posting images.
+
+    python damaged-and-intact-packages/server.py &
+    python damaged-and-intact-packages/loadgen.py --concurrency 20 --requests 2000
+    python damaged-and-intact-packages/loadgen.py --concurrency 1 --requests 200   # sequential baseline
+
+Reports throughput and p50 / p95 / p99 request latency.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+from benchmark import load_images, percentiles, synthetic_jpegs
+
+
+def post_image(url, data, timeout):
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "image/jpeg"}, method="POST")
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:  # 503 busy, 400 bad image
+        status = error.code
+    return time.perf_counter() - start, status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test for the prediction server.")
+    parser.add_argument("--url", default="http://localhost:8000/predict")
+    parser.add_argument("--concurrency", type=int, default=20, help="simultaneous clients")
+    parser.add_argument("--requests", type=int, default=1000, help="total requests")
+    parser.add_argument("--images", help="folder of images to send (default: synthetic JPEGs)")
+    parser.add_argument("--distinct", type=int, default=64, help="number of source images to cycle through")
+    parser.add_argument("--size", type=int, nargs=2, default=(1280, 720), metavar=("W", "H"))
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    if args.images:
+        images = load_images(args.images, args.distinct)
+    else:
+        # Unique JPEG bytes per request so the server's prediction cache is not what gets measured
+        base = synthetic_jpegs(args.distinct, args.size)
+        images = [data + i.to_bytes(4, "big") for i, data in zip(range(args.requests), itertools.cycle(base))]
+    payloads = itertools.cycle(images)
+
+    latencies, failures, busy = [], 0, 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(post_image, args.url, next(payloads), args.timeout) for _ in range(args.requests)]
+        for future in futures:
+            try:
+                latency, status = future.result()
+            except OSError:
+                failures += 1
+                continue
+            if status == 200:
+                latencies.append(latency)
+            elif status == 503:
+                busy += 1
+            else:
+                failures += 1
+    elapsed = time.perf_counter() - start
+
+    stats = percentiles(latencies) if latencies else {}
+    print(f"{len(latencies)} ok, {busy} busy, {failures} failed in {elapsed:.1f}s "
+          f"-> {len(latencies) / elapsed:.1f} req/s at concurrency {args.concurrency}")
+    if stats:
+        print(f"latency p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, "
+              f"p99 {stats['p99_ms']:.1f} ms, max {np.max(latencies) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""In-process metrics: timing spans, counters and histograms, Prometheus text format.
+
+    with metrics.span("inference"):
+        ...
+    metrics.predictions.inc(verdict="DAMAGED")
+
+Set ``METRICS_PORT`` to expose ``/metrics`` for scraping (see
+:func:`start_http_server`); the Streamlit sidebar shows the same numbers.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+import time
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_PORT = os.environ.get("METRICS_PORT")
+PREFIX = "package_inspection_"
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = PREFIX + name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            series[index] += 1
+            series[-1] += value
+
+    def summary(self):
+        """{labels: (count, mean seconds, approx p95 seconds)} for the UI panel."""
+        out = {}
+        with self._lock:
+            for key, series in self._series.items():
+                counts = series[:-1]
+                total = sum(counts)
+                target, running, p95 = 0.95 * total, 0, float("inf")
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    running += count
+                    if running >= target:
+                        p95 = bound
+                        break
+                out[key] = (total, series[-1] / total if total else 0.0, p95)
+        return out
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_label_text(key + (('le', le),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(key)} {series[-1]}")
+                lines.append(f"{self.name}_count{_label_text(key)} {cumulative}")
+        return lines
+
+
+stage_seconds = Histogram("stage_seconds", "Time spent per pipeline stage.")
+batch_sizes = Histogram("batch_size", "Images per model forward pass (micro-batching).", (1, 2, 4, 8, 16, 32, 64, 128))
+predictions = Counter("predictions_total", "Predictions by verdict and source.")
+images_inferred = Counter("images_inferred_total", "Images passed through the model.")
+cache_lookups = Counter("cache_lookups_total", "Cache lookups by cache and result.")
+model_loads = Counter("model_loads_total", "Model loads (first load and reloads).")
+stream_frames = Counter("stream_frames_total", "Streamed frames by outcome.")
+errors = Counter("errors_total", "Errors by stage.")
+front_requests = Counter("front_requests_total", "Inference front admissions by outcome (accepted, queued, busy).")
+
+REGISTRY = (stage_seconds, batch_sizes, predictions, images_inferred, cache_lookups, model_loads, stream_frames, errors,
+            front_requests)
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block into ``stage_seconds{stage=...}``; count errors."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        errors.inc(stage=stage)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_verdicts(verdicts, source):
+    for verdict in verdicts:
+        predictions.inc(verdict=verdict, source=source)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port=METRICS_PORT, host="0.0.0.0"):
+    """Serve ``/metrics`` on a daemon thread (once per process); no-op without a port."""
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
@@ -0,0 +1,42 @@
+"""Inspection panel: one Streamlit custom component for the result and webcam views.
+
+The frontend in ``panel_frontend/`` is plain HTML, CSS and JS (no build step)
+served as static files, and talks to Python through Streamlit's component
+messages. It stays mounted across reruns: each rerun only sends the small
+``args`` dict (scores and an image reference), so the page, its styles and
+the browser-side model in webcam mode are loaded once.
+"""
+from pathlib import Path
+
+import streamlit.components.v1 as components
+
+from assets import ASSETS_PORT
+
+FRONTEND_DIR = Path(__file__).resolve().parent / "panel_frontend"
+
+_component = components.declare_component("inspection_panel", path=str(FRONTEND_DIR))
+
+
+def result_panel(image, damaged, intact, verdict, caption, key):
+    """Show server-side scores next to ``image`` (a URL or data URI of a small preview)."""
+    _component(
+        mode="result", image=image, damaged=damaged, intact=intact, verdict=verdict, caption=caption,
+        key=key, default=None,
+    )
+
+
+def webcam_panel(assets, threshold=None, fps=5, key="webcam_panel"):
+    """Browser-side live inspection with the TF.js model.
+
+    ``threshold`` is the evaluated DAMAGED operating point (None: DAMAGED > INTACT).
+    The model runs at most ``fps`` times a second, and only on frames that
+    changed; scores are smoothed as in live.py.
+
+    Returns the last reported ``{"damaged", "intact", "verdict", "seq"}``
+    (sent once a new smoothed verdict has held for a second), or None.
+    """
+    # Host-relative asset URLs (only ASSETS_PORT set) are resolved in the browser against its own view of the host
+    return _component(
+        mode="webcam", assets=assets, assets_port=ASSETS_PORT, threshold=threshold, fps=fps,
+        caption="📷 Live Webcam", key=key, default=None,
+    )
@@ -0,0 +1,249 @@
+// Inspection panel: a Streamlit custom component without a build step.
+//
+// Speaks the component postMessage protocol directly. Python sends small
+// "streamlit:render" args on every rerun; the page itself stays mounted, so
+// the TF.js runtime and model loaded for the webcam view stay resident.
+//
+// The webcam view mirrors live.py: the video is drawn every animation frame,
+// but the model runs at most ``args.fps`` times a second, and only when a
+// 32x32 grayscale thumbnail differs from the last scored one (or it is older
+// than GATE_MAX_AGE_MS). Scores are smoothed with an EMA, the DOM is written
+// only when a shown number changes, and a new verdict is sent back to Python
+// (which reruns the app) only once it has held for SETTLE_MS.
+
+const Streamlit = {
+    send(type, data) {
+        window.parent.postMessage({ isStreamlitMessage: true, type, ...data }, "*");
+    },
+    ready() {
+        this.send("streamlit:componentReady", { apiVersion: 1 });
+    },
+    setValue(value) {
+        this.send("streamlit:setComponentValue", { value, dataType: "json" });
+    },
+    setHeight(height) {
+        this.send("streamlit:setFrameHeight", { height });
+    },
+};
+
+const el = (id) => document.getElementById(id);
+const COLORS = { DAMAGED: "#e74c3c", INTACT: "#2ecc71" };
+const DEFAULT_FPS = 5;
+const GATE_SIZE = 32, GATE_THRESHOLD = 6, GATE_MAX_AGE_MS = 5000;  // as live.ChangeGate
+const SMOOTHING = 0.3;  // as live.VerdictSmoother
+const SETTLE_MS = 1000;
+
+let args = {};
+let model = null, modelLoading = null, webcam = null, running = false;
+let lastVerdict = null, seq = 0;
+let lastPredictAt = 0, predicting = false, lastRaw = null, smoothed = null, shown = null;
+let reference = null, referenceAt = 0, pending = null, pendingSince = 0;
+const scripts = {};
+const gateCanvas = document.createElement("canvas");
+gateCanvas.width = gateCanvas.height = GATE_SIZE;
+const gateContext = gateCanvas.getContext("2d", { willReadFrequently: true });
+
+function showScores(damaged, intact, verdict) {
+    const damagedPct = Math.round(damaged * 100);
+    const intactPct = Math.round(intact * 100);
+    const mainClass = verdict || (damaged > intact ? "DAMAGED" : "INTACT");
+    const key = `${damagedPct}/${intactPct}/${mainClass}`;
+    if (key === shown) return;  // nothing visible changed
+    shown = key;
+
+    el("main-prediction").textContent = mainClass;
+    el("main-prediction").style.color = COLORS[mainClass];
+    el("confidence").textContent = Math.max(damagedPct, intactPct) + "%";
+    el("confidence").style.color = COLORS[mainClass];
+    el("damaged-bar").style.width = damagedPct + "%";
+    el("damaged-text").textContent = damagedPct + "%";
+    el("intact-bar").style.width = intactPct + "%";
+    el("intact-text").textContent = intactPct + "%";
+}
+
+function resetScores() {
+    shown = null;
+    el("main-prediction").textContent = "Waiting...";
+    el("main-prediction").style.color = "";
+    el("confidence").textContent = "00%";
+    el("confidence").style.color = "";
+    el("damaged-bar").style.width = "0%";
+    el("damaged-text").textContent = "0%";
+    el("intact-bar").style.width = "0%";
+    el("intact-text").textContent = "0%";
+}
+
+function loadScript(src) {
+    if (!scripts[src]) {
+        scripts[src] = new Promise((resolve, reject) => {
+            const script = document.createElement("script");
+            script.src = src;
+            script.onload = resolve;
+            script.onerror = () => reject(new Error("could not load " + src));
+            document.head.appendChild(script);
+        });
+    }
+    return scripts[src];
+}
+
+// "/static/..." (only ASSETS_PORT set on the server) -> that port on the host this page was opened from
+function assetUrl(name) {
+    const url = args.assets[name];
+    if (!url.startsWith("/") || url.startsWith("//") || !args.assets_port) return url;
+    return `${location.protocol}//${location.hostname}:${args.assets_port}${url}`;
+}
+
+// Loaded once per mounted panel; reruns do not reload it
+function loadModel() {
+    if (!modelLoading) {
+        modelLoading = loadScript(assetUrl("tf.min.js"))
+            .then(() => loadScript(assetUrl("teachablemachine-image.min.js")))
+            .then(() => tmImage.load(assetUrl("model.json"), assetUrl("metadata.json")))
+            .then((loaded) => (model = loaded))
+            .catch((error) => {
+                modelLoading = null;
+                throw error;
+            });
+    }
+    return modelLoading;
+}
+
+async function startWebcam() {
+    if (running) return;
+
+    el("status").textContent = model ? "Status: Starting..." : "Status: Loading model...";
+    try {
+        await loadModel();
+
+        webcam = new tmImage.Webcam(480, 480, true);
+        await webcam.setup();
+        await webcam.play();
+
+        running = true;
+        el("status").textContent = "Status: Live";
+        const container = el("webcam-container");
+        container.innerHTML = "";
+        container.appendChild(webcam.canvas);
+
+        loop();
+    } catch (error) {
+        console.error("Webcam error:", error);
+        el("status").textContent = "Status: Error";
+    }
+}
+
+// Draws the video every animation frame; inference is paced and never overlaps
+function loop() {
+    if (!running) return;
+    webcam.update();
+    const now = performance.now();
+    if (!predicting && now - lastPredictAt >= 1000 / (args.fps || DEFAULT_FPS)) {
+        lastPredictAt = now;
+        predicting = true;
+        predict(now).finally(() => (predicting = false));
+    }
+    requestAnimationFrame(loop);
+}
+
+// True if the frame differs enough from the last scored one; it then becomes the reference
+function changed(now) {
+    gateContext.drawImage(webcam.canvas, 0, 0, GATE_SIZE, GATE_SIZE);
+    const rgba = gateContext.getImageData(0, 0, GATE_SIZE, GATE_SIZE).data;
+    const thumb = new Float32Array(GATE_SIZE * GATE_SIZE);
+    for (let i = 0; i < thumb.length; i++) {
+        thumb[i] = 0.299 * rgba[4 * i] + 0.587 * rgba[4 * i + 1] + 0.114 * rgba[4 * i + 2];
+    }
+    let diff = Infinity;
+    if (reference && now - referenceAt < GATE_MAX_AGE_MS) {
+        diff = 0;
+        for (let i = 0; i < thumb.length; i++) diff += Math.abs(thumb[i] - reference[i]);
+        diff /= thumb.length;
+    }
+    if (diff < GATE_THRESHOLD) return false;
+    reference = thumb;
+    referenceAt = now;
+    return true;
+}
+
+async function predict(now) {
+    try {
+        if (changed(now) || !lastRaw) {
+            const predictions = await model.predict(webcam.canvas);
+            let damaged = 0, intact = 0;
+
+            predictions.forEach((p) => {
+                if (p.className.toLowerCase().includes("damage")) {
+                    damaged = Math.max(damaged, p.probability);
+                } else {
+                    intact = Math.max(intact, p.probability);
+                }
+            });
+            lastRaw = { damaged, intact };
+        }
+        // Skipped frames feed the last raw scores again, so the average settles on a stopped parcel
+        smoothed = smoothed
+            ? {
+                damaged: SMOOTHING * lastRaw.damaged + (1 - SMOOTHING) * smoothed.damaged,
+                intact: SMOOTHING * lastRaw.intact + (1 - SMOOTHING) * smoothed.intact,
+            }
+            : { ...lastRaw };
+
+        const { damaged, intact } = smoothed;
+        const threshold = args.threshold;
+        const isDamaged = threshold == null ? damaged > intact : damaged >= threshold;
+        const verdict = isDamaged ? "DAMAGED" : "INTACT";
+        showScores(damaged, intact, verdict);
+        report(damaged, intact, verdict, now);
+    } catch (error) {
+        console.error("Prediction error:", error);
+    }
+}
+
+// Each setValue reruns the whole app script: send a new verdict only once it has held for SETTLE_MS
+function report(damaged, intact, verdict, now) {
+    if (verdict === lastVerdict) {
+        pending = null;
+        return;
+    }
+    if (verdict !== pending) {
+        pending = verdict;
+        pendingSince = now;
+    }
+    if (now - pendingSince >= SETTLE_MS) {
+        lastVerdict = verdict;
+        pending = null;
+        Streamlit.setValue({ damaged, intact, verdict, seq: ++seq });
+    }
+}
+
+function stopWebcam() {
+    if (!running) return;
+    running = false;
+    lastVerdict = pending = lastRaw = smoothed = reference = null;
+    if (webcam) webcam.stop();
+    el("status").textContent = "Status: Stopped";
+    el("webcam-container").innerHTML = "";
+    resetScores();
+}
+
+function render(newArgs) {
+    args = newArgs;
+    document.body.dataset.mode = args.mode;
+    el("caption").textContent = args.caption || "";
+
+    if (args.mode === "result") {
+        el("main-title").textContent = "Prediction Result";
+        if (el("preview").getAttribute("src") !== args.image) el("preview").setAttribute("src", args.image);
+        showScores(args.damaged, args.intact, args.verdict);
+    } else {
+        el("main-title").textContent = "Live Detection";
+        // Warm the runtime and model in the background so Start is instant
+        loadModel().catch((error) => console.error("Model load error:", error));
+    }
+    Streamlit.setHeight(document.body.scrollHeight);
+}
+
+window.addEventListener("message", (event) => {
+    if (event.data && event.data.type === "streamlit:render") render(event.data.args);
+});
+Streamlit.ready();
@@ -0,0 +1,89 @@
+"""Content-addressed prediction cache: LRU in memory, optionally backed by SQLite.
+
+Entries are keyed by a hash of the uploaded bytes plus the model version, so
+a re-uploaded photo is answered without decoding it or touching the model,
+and swapping the weights invalidates everything automatically.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+import metrics
+
+DEFAULT_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "1024"))
+DEFAULT_PATH = os.environ.get("PREDICTION_CACHE_PATH") or None
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class PredictionCache:
+    """Thread-safe LRU of ``{label: probability}`` dicts with an optional SQLite store."""
+
+    def __init__(self, maxsize=DEFAULT_SIZE, path=DEFAULT_PATH):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.path = path
+        self._db = None
+        self.reconnect()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    def reconnect(self):
+        """(Re)open the SQLite store, e.g. in a forked worker; connections must not cross a fork."""
+        if not self.path:
+            return
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, probs TEXT NOT NULL)")
+        self._db.commit()
+
+    @staticmethod
+    def key(model_version, data):
+        return f"{model_version}:{content_hash(data)}"
+
+    def get(self, key):
+        with self._lock:
+            probs = self._entries.get(key)
+            if probs is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                metrics.cache_lookups.inc(cache="prediction", result="hit")
+                return probs
+            if self._db is not None:
+                row = self._db.execute("SELECT probs FROM predictions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    probs = json.loads(row[0])
+                    self._remember(key, probs)
+                    self.stats["disk_hits"] += 1
+                    metrics.cache_lookups.inc(cache="prediction", result="disk_hit")
+                    return probs
+            self.stats["misses"] += 1
+            metrics.cache_lookups.inc(cache="prediction", result="miss")
+            return None
+
+    def put(self, key, probs):
+        with self._lock:
+            self._remember(key, probs)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO predictions VALUES (?, ?)", (key, json.dumps(probs)))
+                self._db.commit()
+
+    def _remember(self, key, probs):
+        self._entries[key] = probs
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        return (self.stats["hits"] + self.stats["disk_hits"]) / lookups if lookups else 0.0
+
+    def report(self):
+        return {**self.stats, "size": len(self._entries), "maxsize": self.maxsize, "hit_rate": round(self.hit_rate(), 3)}
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,124 @@
+"""Pre-fork worker processes for ``server.py``: one listening socket, one model per core group.
+
+    python damaged-and-intact-packages/server.py --port 8000 --workers 8
+    python damaged-and-intact-packages/server.py --port 8000 --workers 4 --threads-per-worker 4
+
+A single Python process is capped by the GIL on decoding, hashing and JSON.
+The parent binds the socket, imports the inference stack (TensorFlow or the
+TFLite runtime, NumPy, PIL; several hundred MB) and pages the model files
+into the OS cache, then freezes its heap (``gc.freeze``) and forks. Workers
+share all of that copy-on-write, and ``.tflite`` weights are memory-mapped
+from the shared page cache. The TensorFlow runtime is only started inside
+each worker (it is not fork-safe once running), so every worker restores its
+own copy of the variables, a few MB for this model.
+
+Each worker gets ``cores // workers`` intra-op threads and one inter-op
+thread, so N workers never run more inference threads than there are cores.
+Workers accept from the shared socket, each with its own batcher and
+inference front. Their metrics live in each worker's memory; with
+``METRICS_PORT`` set, worker ``i`` exports them on ``METRICS_PORT + i`` (the
+same port again after a restart). The parent restarts workers that die and
+stops them all on SIGINT / SIGTERM.
+"""
+import gc
+import os
+import signal
+import sys
+import time
+
+from inference import LABELS_PATH, MODEL_BACKEND, MODEL_DIR, MODEL_VARIANT, model_cache, tflite_path
+from prediction_cache import prediction_cache
+
+
+def threads_per_worker(workers, cores=None):
+    """Inference threads per worker so that ``workers`` of them share the cores without oversubscribing."""
+    return max(1, (cores or os.cpu_count() or 1) // workers)
+
+
+def preload(backend=MODEL_BACKEND, variant=MODEL_VARIANT):
+    """Import the inference runtime and read the model files once, in the parent, before forking."""
+    if backend == "tf":
+        import tensorflow  # noqa: F401 -- import only; the runtime starts in the workers
+
+        files = [f for f in MODEL_DIR.rglob("*") if f.is_file()]
+    else:
+        try:
+            import tflite_runtime.interpreter  # noqa: F401
+        except ImportError:
+            import tensorflow  # noqa: F401
+        files = [tflite_path(variant)]
+    for path in [*files, LABELS_PATH]:
+        with open(path, "rb") as f:  # warm the page cache the workers map the weights from
+            while f.read(1 << 20):
+                pass
+
+
+def configure_worker(threads, backend=MODEL_BACKEND):
+    """Per-worker thread pools; must run before the worker's first model call."""
+    if backend == "tf":
+        import tensorflow as tf
+
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    model_cache.num_threads = threads
+    prediction_cache.reconnect()  # an SQLite connection must not be shared across fork
+
+
+class Prefork:
+    """Fork ``workers`` processes that each call ``run(worker_index)``; restart them if they die."""
+
+    def __init__(self, workers, run):
+        self.workers = workers
+        self.run = run
+        self.children = {}  # pid -> (worker index, start time)
+        self.stopping = False
+
+    def spawn(self, index):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            signal.signal(signal.SIGTERM, signal.default_int_handler)  # stop serving, then exit
+            code = 0
+            try:
+                self.run(index)
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                import traceback
+
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.children[pid] = (index, time.monotonic())
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def serve_forever(self):
+        gc.collect()
+        gc.freeze()  # keep the shared heap out of the collector, so workers do not dirty its pages
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for index in range(self.workers):
+            self.spawn(index)
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            index, started = self.children.pop(pid, (None, 0))
+            if index is not None and not self.stopping:
+                print(f"worker {index} (pid {pid}) exited with status {status}; restarting", file=sys.stderr)
+                if time.monotonic() - started < 1:  # crashing at startup: do not spin
+                    time.sleep(1)
+                self.spawn(index)
@@ -0,0 +1,111 @@
+"""Image preparation for the classifier, shared by the UI, batch and streaming paths.
+
+One stage, three steps:
+
+* decode: JPEGs are decoded in draft mode, i.e. downscaled in the DCT domain
+  to the smallest 1/2, 1/4 or 1/8 scale that still covers the model input
+  (a 12 MP photo decodes at 500x375), then turned upright from EXIF.
+* center crop + resize: a single PIL resize with a crop box.
+* normalize: [0, 255] -> [-1, 1] written straight into a preallocated float32
+  buffer when one is given; otherwise the uint8 pixels are returned (4x
+  smaller for stores, caches and worker IPC) and normalized by the classifier.
+"""
+from io import BytesIO
+
+import numpy as np
+from PIL import ExifTags, Image, ImageOps
+
+import metrics
+
+INPUT_SIZE = 224
+
+
+def decode(image, size=INPUT_SIZE):
+    """Load ``image`` at reduced resolution (JPEG draft mode) and apply its EXIF orientation."""
+    image.draft("RGB", (size, size))  # no-op for non-JPEG images
+    image.load()
+    return ImageOps.exif_transpose(image, in_place=True) or image
+
+
+def oriented_size(image):
+    """(width, height) after EXIF orientation, read from the header without decoding."""
+    width, height = image.size
+    if image.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):  # rotated by 90 degrees
+        return height, width
+    return width, height
+
+
+def normalize(batch, out=None):
+    """uint8 pixels in [0, 255] -> float32 in [-1, 1], as Teachable Machine does.
+
+    float32 input is taken as already normalized and returned as is. ``out``
+    is an optional preallocated float32 array of the same shape.
+    """
+    batch = np.asarray(batch)
+    if batch.dtype == np.float32:
+        return batch
+    if out is None:
+        out = np.empty(batch.shape, dtype=np.float32)
+    np.multiply(batch, np.float32(1 / 127.5), out=out)
+    out -= 1.0
+    return out
+
+
+def prepare_image(image, size=INPUT_SIZE, out=None):
+    """Decode, center-crop and resize ``image`` to (size, size, 3).
+
+    Returns uint8 pixels, or with ``out`` (a float32 (size, size, 3) array,
+    e.g. one row of a batch) writes the normalized pixels there and returns it.
+    """
+    with metrics.span("decode"):
+        image = decode(image, size)
+    with metrics.span("preprocess"):
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        width, height = image.size
+        side = min(width, height)
+        left = (width - side) // 2
+        top = (height - side) // 2
+        image = image.resize((size, size), Image.BILINEAR, box=(left, top, left + side, top + side))
+        pixels = np.asarray(image)
+        return pixels if out is None else normalize(pixels, out)
+
+
+def prepare_batch(images, size=INPUT_SIZE, normalized=False):
+    """Prepare images into one preallocated (N, size, size, 3) batch.
+
+    uint8 by default; ``normalized=True`` fills a float32 [-1, 1] batch in place,
+    which the classifiers take without another conversion.
+    """
+    batch = np.empty((len(images), size, size, 3), dtype=np.float32 if normalized else np.uint8)
+    for i, image in enumerate(images):
+        if normalized:
+            prepare_image(image, size, out=batch[i])
+        else:
+            batch[i] = prepare_image(image, size)
+    return batch
+
+
+PREVIEW_MAX_SIDE = 640
+
+
+def preview_bytes(image, data, max_side=PREVIEW_MAX_SIDE):
+    """Bounded-size preview in the upload's own format -> (bytes, mime type).
+
+    Small uploads are passed through untouched; larger ones are decoded at
+    reduced resolution, downscaled and re-encoded (JPEG stays JPEG) instead of
+    being expanded to a lossless PNG.
+    """
+    fmt = image.format or "JPEG"
+    mime = Image.MIME.get(fmt, "image/jpeg")
+    if max(image.size) <= max_side:
+        return data, mime
+    thumb = decode(image.copy() if image.im else image, max_side)
+    thumb.thumbnail((max_side, max_side), Image.BILINEAR)
+    if fmt not in ("JPEG", "PNG", "WEBP"):
+        fmt, mime = "JPEG", "image/jpeg"
+    if fmt == "JPEG" and thumb.mode not in ("RGB", "L"):
+        thumb = thumb.convert("RGB")
+    buffered = BytesIO()
+    thumb.save(buffered, format=fmt, quality=85)
+    return buffered.getvalue(), mime
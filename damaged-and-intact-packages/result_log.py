@@ -0,0 +1,258 @@
+"""Append-only inspection log: every verdict with its scores, source, image hash and model version.
+
+    python damaged-and-intact-packages/result_log.py --since 2026-10-01 --until 2026-10-08
+    python damaged-and-intact-packages/result_log.py --hash 3f2a...        # audit one image
+
+    result_log.record("upload", damaged, intact, verdicts, hashes, classifier.version)
+    result_log.damage_rates(start, end)    # [{"shift", "inspections", "damaged", "damage_rate"}, ...]
+
+Damage rates count one row per inspected parcel, so by default they only
+include ``INSPECTION_SOURCES``: the webcam logs a row whenever its live
+verdict flips and the server stream one per inferred frame of the same
+parcel, which would skew the rate. Pass ``sources=None`` for every row.
+
+``record`` only appends to in-memory buffers; a background thread writes
+them every ``RESULT_LOG_FLUSH_SECONDS`` (or as soon as ``FLUSH_RECORDS`` are
+pending), so logging costs the caller microseconds. Records go to
+``RESULT_LOG_PATH`` (default ``results/`` next to the model) in segments per
+UTC day and process (``2026-10-18-<pid>/``), one raw little-endian file per
+column, 42 bytes per inspection in total. A segment has a single writer, so
+its rows are in time order: a shift query opens only the days it covers,
+binary-searches the time column and sums the verdict column over the
+matching slice, without reading the other columns.
+"""
+import argparse
+import atexit
+from datetime import date, datetime, timedelta, timezone
+import os
+from pathlib import Path
+import threading
+import time
+
+import numpy as np
+
+from inference import BASE_DIR
+
+LOG_DIR = Path(os.environ.get("RESULT_LOG_PATH") or BASE_DIR / "results")
+FLUSH_SECONDS = float(os.environ.get("RESULT_LOG_FLUSH_SECONDS", "1"))
+FLUSH_RECORDS = 4096
+SHIFT_HOURS = tuple(int(h) for h in os.environ.get("SHIFT_HOURS", "6,14,22").split(","))  # local shift starts
+COLUMNS = {
+    "time_ms": np.dtype("<i8"),
+    "source": np.dtype("u1"),
+    "verdict": np.dtype("u1"),  # 1 = DAMAGED
+    "damaged": np.dtype("<f4"),
+    "intact": np.dtype("<f4"),
+    "content_hash": np.dtype("S16"),  # blake2b-128 of the image bytes, zeros when there are none (webcam)
+    "model_version": np.dtype("S8"),
+}
+# Stored as the index into this tuple: append new sources, never reorder
+SOURCES = ("other", "upload", "upload-tiled", "upload-batch", "webcam", "http", "cli", "stream", "webcam-snapshot")
+INSPECTION_SOURCES = ("upload", "upload-tiled", "upload-batch", "webcam-snapshot", "http", "cli")  # one row per parcel
+
+
+def _hex_bytes(value):
+    return bytes.fromhex(value) if value else b""
+
+
+def _hex(value, size):
+    return value.ljust(size, b"\0").hex()  # NumPy drops trailing zero bytes of "S" items
+
+
+def _utc_day(ms):
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).date()
+
+
+def _ms(moment):
+    return int(moment.timestamp() * 1000)
+
+
+class Segment:
+    """Read-only view of one segment directory; columns are memory-mapped on first use."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        sizes = [(self.path / name).stat().st_size // dtype.itemsize if (self.path / name).exists() else 0
+                 for name, dtype in COLUMNS.items()]
+        self.count = min(sizes)  # a flush cut short by a crash leaves some columns longer
+        self._columns = {}
+
+    def column(self, name):
+        if name not in self._columns:
+            self._columns[name] = (
+                np.memmap(self.path / name, dtype=COLUMNS[name], mode="r", shape=(self.count,))
+                if self.count else np.empty(0, dtype=COLUMNS[name])
+            )
+        return self._columns[name]
+
+    def bounds(self, start_ms, end_ms):
+        """Row range with ``start_ms <= time < end_ms`` (rows are in time order)."""
+        return tuple(np.searchsorted(self.column("time_ms"), [start_ms, end_ms], side="left"))
+
+
+class ResultLog:
+    """Thread-safe buffered writer plus the query side for one log directory."""
+
+    def __init__(self, directory=LOG_DIR, flush_seconds=FLUSH_SECONDS):
+        self.directory = Path(directory)
+        self.flush_seconds = flush_seconds
+        self._pending = {name: [] for name in COLUMNS}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.stats = {"recorded": 0, "written": 0, "flushes": 0}
+
+    def record(self, source, damaged, intact, verdicts, hashes=None, model_version=""):
+        """Queue one row per verdict; ``hashes`` are ``content_hash`` hex strings (or None)."""
+        verdicts = list(verdicts)
+        hashes = [None] * len(verdicts) if hashes is None else hashes
+        source_code = SOURCES.index(source) if source in SOURCES else 0
+        version = _hex_bytes(model_version)
+        with self._lock:
+            now = int(time.time() * 1000)  # taken under the lock, so rows are appended in time order
+            self._start()
+            pending = self._pending
+            pending["time_ms"] += [now] * len(verdicts)
+            pending["source"] += [source_code] * len(verdicts)
+            pending["verdict"] += [v == "DAMAGED" for v in verdicts]
+            pending["damaged"] += list(np.atleast_1d(damaged))
+            pending["intact"] += list(np.atleast_1d(intact))
+            pending["content_hash"] += [_hex_bytes(h) for h in hashes]
+            pending["model_version"] += [version] * len(verdicts)
+            self.stats["recorded"] += len(verdicts)
+            if len(pending["time_ms"]) >= FLUSH_RECORDS:
+                self._wake.set()
+
+    def _start(self):
+        # (Re)start the writer in this process; a forked worker does not inherit the parent's thread
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="result-log", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far; one append per column file."""
+        with self._write_lock:
+            with self._lock:
+                if not self._pending["time_ms"]:
+                    return
+                pending, self._pending = self._pending, {name: [] for name in COLUMNS}
+            columns = {name: np.asarray(pending[name], dtype=dtype) for name, dtype in COLUMNS.items()}
+            first, last = _utc_day(columns["time_ms"][0]), _utc_day(columns["time_ms"][-1])
+            if first == last:
+                splits = [(first, slice(None))]
+            else:  # the batch straddles midnight UTC
+                midnight = datetime.combine(last, datetime.min.time(), timezone.utc)
+                cut = int(np.searchsorted(columns["time_ms"], _ms(midnight)))
+                splits = [(first, slice(None, cut)), (last, slice(cut, None))]
+            for day, rows in splits:
+                segment = self.directory / f"{day.isoformat()}-{os.getpid()}"
+                segment.mkdir(parents=True, exist_ok=True)
+                for name, values in columns.items():
+                    with open(segment / name, "ab") as f:
+                        f.write(values[rows].tobytes())
+            self.stats["written"] += len(columns["time_ms"])
+            self.stats["flushes"] += 1
+
+    def segments(self, start_ms, end_ms):
+        """Segments of every UTC day that overlaps ``[start_ms, end_ms)``."""
+        day, last = _utc_day(start_ms), _utc_day(max(end_ms - 1, start_ms))
+        while day <= last:
+            for path in sorted(self.directory.glob(f"{day.isoformat()}-*")):
+                yield Segment(path)
+            day += timedelta(days=1)
+
+    def damage_rates(self, start, end, shift_hours=SHIFT_HOURS, sources=INSPECTION_SOURCES):
+        """Inspections, DAMAGED count and rate per shift between two local datetimes.
+
+        Only rows from ``sources`` are counted (None: all of them); the source
+        column is sliced like the verdict column.
+        """
+        codes = None if sources is None else np.array([SOURCES.index(source) for source in sources], dtype=np.uint8)
+        start, end = start.astimezone(), end.astimezone()
+        first = start.date() - timedelta(days=1)  # the night shift may have started the day before
+        boundaries = sorted(
+            datetime.combine(first + timedelta(days=d), datetime.min.time()).replace(hour=h).astimezone()
+            for d in range((end.date() - first).days + 2) for h in shift_hours
+        )
+        windows = [
+            (max(a, start), min(b, end), a) for a, b in zip(boundaries, boundaries[1:]) if a < end and b > start
+        ]
+        segments = list(self.segments(_ms(start), _ms(end)))
+        rates = []
+        for window_start, window_end, shift_start in windows:
+            inspections = damaged = 0
+            for segment in segments:
+                lo, hi = segment.bounds(_ms(window_start), _ms(window_end))
+                verdicts = segment.column("verdict")[lo:hi]
+                if codes is not None:
+                    verdicts = verdicts[np.isin(segment.column("source")[lo:hi], codes)]
+                inspections += len(verdicts)
+                damaged += int(verdicts.sum(dtype=np.int64))
+            rates.append({
+                "shift": shift_start.strftime("%Y-%m-%d %H:%M"),
+                "inspections": inspections,
+                "damaged": damaged,
+                "damage_rate": damaged / inspections if inspections else None,
+            })
+        return rates
+
+    def records(self, start, end, content_hash=None):
+        """Decoded rows between two datetimes, optionally only those of one image."""
+        wanted = _hex_bytes(content_hash) if content_hash else None
+        rows = []
+        for segment in self.segments(_ms(start), _ms(end)):
+            lo, hi = segment.bounds(_ms(start), _ms(end))
+            picked = np.arange(lo, hi)
+            if wanted is not None:
+                picked = picked[segment.column("content_hash")[lo:hi] == wanted]
+            for i in picked:
+                rows.append({
+                    "time_ms": int(segment.column("time_ms")[i]),
+                    "source": SOURCES[segment.column("source")[i]],
+                    "content_hash": _hex(segment.column("content_hash")[i], 16),
+                    "damaged": float(segment.column("damaged")[i]),
+                    "intact": float(segment.column("intact")[i]),
+                    "verdict": "DAMAGED" if segment.column("verdict")[i] else "INTACT",
+                    "model_version": _hex(segment.column("model_version")[i], 8),
+                })
+        return sorted(rows, key=lambda row: row["time_ms"])
+
+
+result_log = ResultLog()
+atexit.register(result_log.flush)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-shift damage rates (or one image's history) from the result log.")
+    parser.add_argument("--since", type=date.fromisoformat, default=date.today(), help="first local day (default today)")
+    parser.add_argument("--until", type=date.fromisoformat, help="last local day, inclusive (default --since)")
+    parser.add_argument("--hash", help="list every inspection of the image with this content hash instead")
+    parser.add_argument("--source", action="append", choices=SOURCES, dest="sources",
+                        help=f"count rows from this source (repeatable; default: {', '.join(INSPECTION_SOURCES)})")
+    parser.add_argument("--all-sources", action="store_true", help="count every row, webcam flips and stream frames too")
+    args = parser.parse_args(argv)
+    sources = None if args.all_sources else args.sources or INSPECTION_SOURCES
+
+    start = datetime.combine(args.since, datetime.min.time()).astimezone()
+    end = datetime.combine((args.until or args.since) + timedelta(days=1), datetime.min.time()).astimezone()
+    if args.hash:
+        for row in result_log.records(start, end, args.hash):
+            print(row)
+        return
+    print(f"{'shift':<18}{'inspections':>12}{'damaged':>10}{'rate':>8}")
+    for row in result_log.damage_rates(start, end, sources=sources):
+        rate = f"{row['damage_rate']:.1%}" if row["damage_rate"] is not None else "-"
+        print(f"{row['shift']:<18}{row['inspections']:>12}{row['damaged']:>10}{rate:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Headless batch scorer: score a directory (or glob) of images to CSV / JSONL.
+
+    python damaged-and-intact-packages/score.py captures/ -o results.csv --workers 8
+    python damaged-and-intact-packages/score.py "captures/**/*.jpg" -o results.jsonl --resume
+    python damaged-and-intact-packages/score.py archive.store -o rescored.csv    # see dataset.py
+    python damaged-and-intact-packages/score.py captures/ -o results.csv --index  # flag near-duplicates
+
+Images are decoded in a process pool and fed in batches to a single model
+instance. Results are appended as each batch finishes, so memory stays flat
+on large folders and ``--resume`` skips files already in the output. A
+preprocessed store built by ``dataset.py`` is read straight from its memory
+map instead, with no decoding at all. ``--index`` also adds every image to
+the embedding index (see ``similarity.py``) and fills a ``duplicate_of``
+column for images that look like an earlier inspection.
+"""
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import glob
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import sys
+
+import numpy as np
+from PIL import Image
+
+import metrics
+from preprocess import prepare_image
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+FIELDS = ["path", "damaged", "intact", "verdict"]
+
+
+def iter_images(sources):
+    """Yield image paths from directories (walked recursively) and glob patterns."""
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if Path(name).suffix.lower() in IMAGE_EXTENSIONS:
+                        yield os.path.join(root, name)
+        else:
+            for path in glob.iglob(source, recursive=True):
+                if Path(path).suffix.lower() in IMAGE_EXTENSIONS:
+                    yield path
+
+
+def load_pixels(path):
+    """Decode and resize one image in a worker process; returns (path, pixels or error)."""
+    try:
+        with Image.open(path) as image:
+            return path, prepare_image(image)
+    except Exception as error:  # unreadable / truncated files are reported, not fatal
+        return path, f"{type(error).__name__}: {error}"
+
+
+def bounded_map(pool, fn, items, window):
+    """Ordered ``pool.map`` that keeps at most ``window`` tasks in flight."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def finished_paths(output):
+    """Paths already present in an existing CSV / JSONL output."""
+    if not output.exists():
+        return set()
+    with output.open(encoding="utf-8", newline="") as f:
+        if output.suffix == ".jsonl":
+            return {json.loads(line)["path"] for line in f if line.strip()}
+        return {row["path"] for row in csv.DictReader(f)}
+
+
+class ResultWriter:
+    """Append-only CSV / JSONL writer, flushed after every batch."""
+
+    def __init__(self, output, fields=FIELDS):
+        self.jsonl = output.suffix == ".jsonl"
+        new_file = not output.exists() or output.stat().st_size == 0
+        self.file = output.open("a", encoding="utf-8", newline="")
+        if not self.jsonl:
+            self.csv = csv.DictWriter(self.file, fieldnames=fields)
+            if new_file:
+                self.csv.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if self.jsonl:
+                self.file.write(json.dumps(row) + "\n")
+            else:
+                self.csv.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score package images as DAMAGED / INTACT.")
+    parser.add_argument("sources", nargs="+", help="image directories, glob patterns or dataset.py stores")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="results file (.csv or .jsonl)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="decode processes")
+    parser.add_argument("--batch-size", type=int, default=32, help="images per forward pass")
+    parser.add_argument("--resume", action="store_true", help="skip paths already in the output file")
+    parser.add_argument("--index", action="store_true",
+                        help="add images to the embedding index and report near-duplicates (tf backend)")
+    return parser.parse_args(argv)
+
+
+def score_batch(classifier, paths, pixels, writer, index=None):
+    """Score one batch, write its rows, return how many were scored."""
+    from inference import split_scores_batch, verdict
+
+    if index is None:
+        probs = classifier.predict_batch(pixels)
+    else:
+        features, probs = classifier.embed_batch(pixels)  # same forward pass, plus the embeddings
+    damaged, intact = split_scores_batch(probs, classifier.labels)
+    verdicts = [verdict(d, i) for d, i in zip(damaged, intact)]
+    metrics.record_verdicts(verdicts, source="cli")
+    rows = [
+        {"path": path, "damaged": round(float(d), 6), "intact": round(float(i), 6), "verdict": v}
+        for path, d, i, v in zip(paths, damaged, intact, verdicts)
+    ]
+    if index is not None:
+        from similarity import remember
+
+        for row, (_, duplicate) in zip(rows, remember(index, features, paths, paths, damaged, intact)):
+            row["duplicate_of"] = duplicate.meta["name"] if duplicate else ""
+    writer.write(rows)
+    return len(paths)
+
+
+def score_store(classifier, store, done, batch_size, writer, index=None):
+    """Score a memory-mapped store: contiguous slices go to the model without decoding."""
+    todo = np.array([path not in done for path in store.paths])
+    scored = 0
+    for start, pixels in store.batches(batch_size):
+        keep = todo[start:start + len(pixels)]
+        if not keep.any():
+            continue
+        paths = store.paths[start:start + len(pixels)]
+        if not keep.all():  # partially resumed batch: the one place rows get copied
+            paths, pixels = [p for p, k in zip(paths, keep) if k], pixels[keep]
+        scored += score_batch(classifier, paths, pixels, writer, index)
+        print(f"\rscored {scored} images", end="", file=sys.stderr, flush=True)
+    return scored
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from dataset import ImageStore, is_store
+    from inference import get_classifier
+
+    done = finished_paths(args.output) if args.resume else set()
+    if not args.resume and args.output.exists():
+        args.output.unlink()
+    stores = [ImageStore(source) for source in args.sources if is_store(source)]
+    sources = [source for source in args.sources if not is_store(source)]
+    paths = (p for p in iter_images(sources) if p not in done)
+
+    classifier = get_classifier()
+    index = None
+    if args.index:
+        from similarity import embedding_index
+
+        index = embedding_index(classifier)
+        if index is None:
+            raise SystemExit(f"--index needs embeddings, which the {classifier.backend} backend does not expose")
+    writer = ResultWriter(args.output, FIELDS + ["duplicate_of"] if index is not None else FIELDS)
+    scored = failed = 0
+    try:
+        for store in stores:
+            scored += score_store(classifier, store, done, args.batch_size, writer, index)
+        # spawn, not fork: the parent already holds TensorFlow's thread pools
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+            decoded = bounded_map(pool, load_pixels, paths, window=2 * args.batch_size)
+            for batch in batched(decoded, args.batch_size):
+                good = [(path, pixels) for path, pixels in batch if isinstance(pixels, np.ndarray)]
+                for path, result in batch:
+                    if not isinstance(result, np.ndarray):
+                        failed += 1
+                        metrics.errors.inc(stage="decode")
+                        print(f"skipping {path}: {result}", file=sys.stderr)
+                if not good:
+                    continue
+                scored += score_batch(
+                    classifier, [path for path, _ in good], np.stack([pixels for _, pixels in good]), writer, index
+                )
+                print(f"\rscored {scored} images", end="", file=sys.stderr, flush=True)
+    finally:
+        writer.close()
+    print(f"\nscored {scored}, skipped {len(done)} already done, {failed} failed -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""HTTP prediction service shared by several inspection stations.
+
+    python damaged-and-intact-packages/server.py --port 8000 --max-batch-size 32 --max-wait-ms 5
+    curl --data-binary @parcel.jpg -H "Content-Type: image/jpeg" http://localhost:8000/predict
+
+``POST /predict`` takes raw image bytes and returns the per-class
+probabilities (``labels.txt`` names), the DAMAGED / INTACT split and the
+verdict as JSON. Requests are decoded on their own threads and merged into
+dynamic batches by :class:`batching.MicroBatcher`, so many cameras share one
+model instance. Work is admitted through an :class:`async_front.InferenceFront`:
+when every slot and the waiting line are taken the answer is an immediate
+``503`` with ``Retry-After`` instead of an ever-growing queue.
+``GET /health``, ``GET /metrics`` and the vendored browser assets under
+``GET /static/`` (see assets.py) are also served.
+
+``--workers N`` forks N such servers on one port to use more cores than a
+single GIL allows; see prefork.py. Each worker answers ``/health`` and
+``/metrics`` for itself, so on the shared port they show whichever worker took
+the connection. With ``METRICS_PORT`` set, worker ``i`` also serves its
+``/metrics`` on ``METRICS_PORT + i``; scrape all N ports and sum them in
+Prometheus.
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+import json
+import os
+import socket
+import sys
+
+from PIL import Image, UnidentifiedImageError
+
+import assets
+from async_front import Busy, InferenceFront
+from batching import MicroBatcher
+from inference import model_cache, split_scores, verdict
+import metrics
+from prediction_cache import prediction_cache
+from preprocess import prepare_image
+from result_log import result_log
+
+MAX_BODY_BYTES = 32 * 1024 * 1024
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    batcher = None  # set by make_server
+    front = None
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/health":
+            status = "ok" if model_cache.loaded else "loading"
+            self._send_json(200, {
+                "status": status, "pid": os.getpid(), **model_cache.stats, "front": self.front.status(),
+            })
+        elif path == "/metrics":
+            self._send(200, metrics.render().encode(), "text/plain; version=0.0.4; charset=utf-8")
+        elif path.startswith("/static/"):
+            assets.send_static(self, path[len("/static/"):])
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        # Replies that leave the body unread close the connection, or keep-alive would parse it as the next request
+        close = {"Connection": "close"}
+        if self.path.split("?")[0] != "/predict":
+            self._send_json(404, {"error": "not found"}, close)
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self._send_json(400, {"error": "invalid Content-Length"}, close)
+            return
+        if not 0 < length <= MAX_BODY_BYTES:
+            self._send_json(
+                413 if length > MAX_BODY_BYTES else 400,
+                {"error": f"body must be 1..{MAX_BODY_BYTES} bytes of image data"}, close,
+            )
+            return
+        if self.front.full():
+            # Reject without buffering the body so a burst does not pile up in memory
+            metrics.front_requests.inc(outcome="busy")
+            self._discard_body(length)
+            self._send_busy(self.front.status()["waiting"])
+            return
+        data = self.rfile.read(length)
+        try:
+            with metrics.span("request"):
+                result = self.front.run(self.predict, data)
+        except Busy as busy:
+            self._send_busy(busy.waiting)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as error:
+            metrics.errors.inc(stage="decode")
+            self._send_json(400, {"error": f"could not decode image: {error}"})
+        except Exception as error:  # odd image modes, model failures from the batcher: answer, don't drop
+            metrics.errors.inc(stage="predict")
+            print(f"prediction failed: {error!r}", file=sys.stderr)
+            self._send_json(500, {"error": f"prediction failed: {type(error).__name__}"})
+        else:
+            self._send_json(200, result)
+
+    def predict(self, data):
+        classifier = model_cache.get()
+        key = prediction_cache.key(classifier.version, data)
+        probs = prediction_cache.get(key)
+        if probs is None:
+            with Image.open(BytesIO(data)) as image:
+                pixels = prepare_image(image)
+            probs = self.batcher.predict(pixels)
+            prediction_cache.put(key, probs)
+        damaged, intact = split_scores(probs)
+        result = verdict(damaged, intact)
+        metrics.record_verdicts([result], source="http")
+        # the cache key already carries the content hash ("<version>:<hash>")
+        result_log.record("http", damaged, intact, [result], [key.rpartition(":")[2]], classifier.version)
+        return {
+            "probabilities": probs,
+            "damaged": damaged,
+            "intact": intact,
+            "verdict": result,
+            "model_version": classifier.version,
+        }
+
+    def _discard_body(self, length, chunk_size=64 * 1024):
+        while length > 0:
+            length -= len(self.rfile.read(min(length, chunk_size)) or b"") or length
+
+    def _send_busy(self, waiting):
+        self._send_json(503, {"error": "busy", "waiting": waiting}, {"Retry-After": "1"})
+
+    def _send_json(self, status, payload, headers=None):
+        self._send(status, json.dumps(payload).encode(), "application/json", headers)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog; the socketserver default of 5 resets bursts of connections
+
+
+def make_server(host="0.0.0.0", port=8000, max_batch_size=32, max_wait=0.005, max_in_flight=64, max_waiting=256,
+                listener=None):
+    """HTTP server with its own batcher and front; ``listener`` is an already-bound socket to serve on."""
+    handler = type("Handler", (PredictionHandler,), {
+        "batcher": MicroBatcher(max_batch_size, max_wait),
+        # in-flight jobs wait on the batcher, so allow enough of them to fill a batch
+        "front": InferenceFront(max(max_in_flight, max_batch_size), max_waiting),
+    })
+    if listener is None:
+        return PredictionServer((host, port), handler)
+    server = PredictionServer(listener.getsockname(), handler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = listener
+    return server
+
+
+def serve_workers(host, port, workers, threads=None, **options):
+    """Bind once, preload the model stack, then fork ``workers`` servers on the shared socket."""
+    import prefork
+
+    threads = threads or prefork.threads_per_worker(workers)
+    listener = socket.create_server((host, port), backlog=PredictionServer.request_queue_size)
+    # Every worker polls the socket; the ones that lose the race for a connection get EAGAIN instead of blocking
+    listener.setblocking(False)
+    prefork.preload()
+
+    def run(index):
+        prefork.configure_worker(threads)
+        if metrics.METRICS_PORT:
+            metrics.start_http_server(int(metrics.METRICS_PORT) + index)  # a scrape target per worker
+        model_cache.get()  # load + warm up before accepting traffic
+        server = make_server(host, port, listener=listener, **options)
+        print(f"worker {index} (pid {os.getpid()}) ready, {threads} inference threads", flush=True)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            result_log.flush()  # workers leave with os._exit, which skips atexit
+
+    print(f"serving on http://{host}:{port} with {workers} workers (POST /predict, GET /health, GET /metrics)")
+    try:
+        prefork.Prefork(workers, run).serve_forever()
+    finally:
+        listener.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve DAMAGED / INTACT predictions over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=32, help="largest merged batch")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="how long a batch waits to fill up")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="requests decoded / inferred at once")
+    parser.add_argument("--max-waiting", type=int, default=256, help="requests queued beyond that before answering 503")
+    parser.add_argument("--workers", type=int, default=1, help="forked server processes sharing the port")
+    parser.add_argument("--threads-per-worker", type=int, help="inference threads per worker (default: cores / workers)")
+    args = parser.parse_args(argv)
+
+    options = {
+        "max_batch_size": args.max_batch_size, "max_wait": args.max_wait_ms / 1000,
+        "max_in_flight": args.max_in_flight, "max_waiting": args.max_waiting,
+    }
+    if args.workers > 1:
+        serve_workers(args.host, args.port, args.workers, args.threads_per_worker, **options)
+        return
+    model_cache.get()  # load + warm up before accepting traffic
+    server = make_server(args.host, args.port, **options)
+    print(f"serving on http://{args.host}:{args.port} (POST /predict, GET /health, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Embedding index: near-duplicate detection and similar past inspections.
+
+    index = embedding_index(classifier)             # None for backends without embeddings
+    matches = index.search(embeddings, k=5)         # per query: [Match(similarity, meta), ...]
+    results = remember(index, embeddings, keys, names, damaged, intact)   # search, then insert new views
+
+Embeddings are the pooled MobileNetV2 features that feed the classifier head
+(1280 floats), taken from the same forward pass as the verdict and
+L2-normalized, so a matrix product gives cosine similarities. The head's
+Dense(100) ReLU layer is smaller but squeezes unrelated parcels into a
+narrow cone (cosine 0.8-0.95), too close to tell re-shots apart. The index is
+flat: a preallocated float32 array searched with one matmul and
+``argpartition``, which stays in the millisecond range up to a few hundred
+thousand inspections. It is persisted per model version as an append-only
+``<version>.f32`` vector file plus ``<version>.jsonl`` metadata under
+``EMBEDDING_INDEX_PATH`` (default ``embeddings/`` next to the model), so
+inserts are incremental and a restart reloads everything. Near-duplicates
+are not stored again; their keys are recorded in ``<version>.aliases.jsonl``
+as pointing at the matched entry, so a repeat of their bytes still finds a
+stored embedding.
+"""
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+import threading
+import time
+
+import numpy as np
+
+from inference import BASE_DIR, verdict
+import metrics
+
+INDEX_DIR = Path(os.environ.get("EMBEDDING_INDEX_PATH") or BASE_DIR / "embeddings")
+DUPLICATE_SIMILARITY = float(os.environ.get("DUPLICATE_SIMILARITY", "0.97"))  # re-shots score ~0.98
+TOP_K = 5
+
+
+@dataclass
+class Match:
+    similarity: float
+    meta: dict
+
+
+def unit(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIndex:
+    """Flat cosine-similarity index with incremental, append-only persistence."""
+
+    def __init__(self, dim, path=None):
+        self.dim = dim
+        self.path = Path(path) if path else None
+        self._vectors = np.empty((1024, dim), dtype=np.float32)
+        self._meta = []
+        self._rows = {}  # key -> row; aliases map to the row of the entry they duplicate
+        self._lock = threading.Lock()
+        if self.path:
+            self._load()
+
+    def __len__(self):
+        return len(self._meta)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def _load(self):
+        vectors_path, meta_path = self.path.with_suffix(".f32"), self.path.with_suffix(".jsonl")
+        if not vectors_path.exists() or not meta_path.exists():
+            return
+        vectors = np.fromfile(vectors_path, dtype=np.float32)
+        vectors = vectors[:len(vectors) // self.dim * self.dim].reshape(-1, self.dim)
+        with meta_path.open(encoding="utf-8") as f:
+            meta = [json.loads(line) for line in f if line.strip()]
+        count = min(len(vectors), len(meta))  # an interrupted append leaves the longer file ahead
+        self._append(vectors[:count], meta[:count])
+        aliases_path = self.path.with_suffix(".aliases.jsonl")
+        if aliases_path.exists():
+            with aliases_path.open(encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        alias = json.loads(line)
+                        if alias["of"] in self._rows:
+                            self._rows.setdefault(alias["key"], self._rows[alias["of"]])
+
+    def _append(self, vectors, metas):
+        needed = len(self._meta) + len(vectors)
+        if needed > len(self._vectors):
+            grown = np.empty((max(needed, 2 * len(self._vectors)), self.dim), dtype=np.float32)
+            grown[:len(self._meta)] = self._vectors[:len(self._meta)]
+            self._vectors = grown
+        self._vectors[len(self._meta):needed] = vectors
+        for meta in metas:
+            self._rows[meta["key"]] = len(self._meta)
+            self._meta.append(meta)
+
+    def vector(self, key):
+        """Stored (unit) embedding for ``key``, or None."""
+        with self._lock:
+            row = self._rows.get(key)
+            return None if row is None else self._vectors[row].copy()
+
+    def add(self, embeddings, metas):
+        """Insert embeddings with their metadata dicts (each needs a unique ``"key"``)."""
+        vectors = unit(embeddings)
+        with self._lock:
+            self._append(vectors, metas)
+            if self.path:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.with_suffix(".f32").open("ab") as f:
+                    f.write(vectors.tobytes())
+                with self.path.with_suffix(".jsonl").open("a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(meta) + "\n" for meta in metas)
+
+    def alias(self, key, of_key):
+        """Point ``key`` at the entry stored for ``of_key`` (no-op if ``key`` is already known)."""
+        with self._lock:
+            if key in self._rows or of_key not in self._rows:
+                return
+            self._rows[key] = self._rows[of_key]
+            if self.path:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.with_suffix(".aliases.jsonl").open("a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "of": of_key}) + "\n")
+
+    def search(self, embeddings, k=TOP_K):
+        """Top-``k`` matches per query embedding, best first."""
+        queries = unit(embeddings)
+        with metrics.span("similarity_search"), self._lock:
+            count = len(self._meta)
+            if not count:
+                return [[] for _ in queries]
+            scores = queries @ self._vectors[:count].T
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            results = []
+            for row_scores, candidates in zip(scores, top):
+                ranked = candidates[np.argsort(-row_scores[candidates])]
+                results.append([Match(float(row_scores[i]), self._meta[i]) for i in ranked])
+            return results
+
+
+def near_duplicate(matches, threshold=DUPLICATE_SIMILARITY):
+    """The best match if it is similar enough to count as the same parcel, else None."""
+    return matches[0] if matches and matches[0].similarity >= threshold else None
+
+
+def remember(index, vectors, keys, names, damaged, intact):
+    """Find similar past inspections, then index the new ones; ``(matches, duplicate)`` per image.
+
+    An image's own earlier entry (same key, e.g. a rerun) is left out of its
+    matches. Near-duplicates of another inspection are reported but not
+    inserted again, so the index keeps one entry per distinct parcel view;
+    their key becomes an alias of the matched entry instead.
+    """
+    vectors = unit(vectors)
+    results, new_vectors, new_meta, aliases = [], [], [], []
+    found = index.search(vectors, TOP_K + 1)  # one spare for the image's own entry
+    for matches, vector, key, name, d, i in zip(found, vectors, keys, names, damaged, intact):
+        matches = [m for m in matches if m.meta["key"] != key][:TOP_K]
+        duplicate = near_duplicate(matches)
+        if duplicate is None and new_vectors:  # also compare with earlier images of the same batch
+            similarities = np.stack(new_vectors) @ vector
+            best = int(np.argmax(similarities))
+            duplicate = near_duplicate([Match(float(similarities[best]), new_meta[best])])
+        if duplicate is not None:
+            aliases.append((key, duplicate.meta["key"]))
+        elif key not in index and key not in (meta["key"] for meta in new_meta):
+            new_vectors.append(vector)
+            new_meta.append({
+                "key": key, "name": name, "damaged": round(float(d), 4), "intact": round(float(i), 4),
+                "verdict": verdict(d, i), "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            })
+        results.append((matches, duplicate))
+    if new_vectors:
+        index.add(np.stack(new_vectors), new_meta)
+    for key, of_key in aliases:  # after the add: a batch may duplicate one of its own new images
+        index.alias(key, of_key)
+    return results
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def embedding_index(classifier, directory=INDEX_DIR):
+    """Process-wide index for the classifier's model version, or None if it has no embeddings."""
+    if not classifier.embeddings:
+        return None
+    with _indexes_lock:
+        if classifier.version not in _indexes:
+            dim = classifier.embed_batch(np.zeros((1, 224, 224, 3), dtype=np.uint8))[0].shape[1]
+            _indexes[classifier.version] = EmbeddingIndex(dim, Path(directory) / classifier.version)
+        return _indexes[classifier.version]
@@ -0,0 +1,68 @@
+"""Startup-time regression check for app.py's import path.
+
+    python damaged-and-intact-packages/startup_budget.py --budget-ms 1500
+
+Runs app.py's top-level imports in a fresh interpreter under
+``python -X importtime`` and fails (exit code 1) if they take longer than
+the budget or pull in a module that must stay lazy (TensorFlow, OpenCV).
+These imports are what every cold start pays before the page renders.
+"""
+import argparse
+import ast
+from pathlib import Path
+import subprocess
+import sys
+
+APP_PATH = Path(__file__).resolve().parent / "app.py"
+FORBIDDEN = ("tensorflow", "keras", "tflite_runtime", "cv2")
+DEFAULT_BUDGET_MS = 1500
+
+
+def top_level_imports(path=APP_PATH):
+    """Source of the module-level import statements of ``path``."""
+    source = path.read_text(encoding="utf-8")
+    return "\n".join(
+        ast.get_source_segment(source, node)
+        for node in ast.parse(source).body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+
+def import_times(code, cwd):
+    """{module: (self_us, cumulative_us)} from ``python -X importtime -c code``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            times[name] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check app.py's import-time budget.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="show the N slowest imports")
+    args = parser.parse_args(argv)
+
+    times = import_times(top_level_imports(), APP_PATH.parent)
+    total_ms = sum(self_us for self_us, _ in times.values()) / 1000
+    for name, (_, cumulative_us) in sorted(times.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"{cumulative_us / 1000:>9.1f} ms  {name}")
+
+    failures = [f"{name} is imported at startup" for name in times if name.split(".")[0] in FORBIDDEN]
+    if total_ms > args.budget_ms:
+        failures.append(f"imports took {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"total import time: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for failure in dict.fromkeys(failures):
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
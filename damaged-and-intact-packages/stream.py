@@ -0,0 +1,199 @@
+"""Server-side streaming inspection: capture -> latest-frame queue -> inference.
+
+Capture, inference and rendering run independently. The capture thread
+always overwrites the newest frame, the inference thread scores at most
+``target_fps`` frames per second, and the UI just reads the latest result,
+so a slow model drops frames instead of adding latency.
+
+A recorded video file works anywhere a camera index does::
+
+    python damaged-and-intact-packages/stream.py parcels.mp4 --fps 5
+"""
+import argparse
+from collections import deque
+from dataclasses import dataclass
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from inference import split_scores, verdict
+from live import ChangeGate, LiveScorer, VerdictSmoother
+import metrics
+from result_log import result_log
+
+
+class LatestFrameQueue:
+    """Bounded queue where a full queue drops its oldest frame (latest wins)."""
+
+    def __init__(self, maxsize=1):
+        self._frames = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Newest frame, or ``None`` after ``timeout`` seconds without one."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frames, timeout):
+                return None
+            item = self._frames.pop()
+            self.dropped += len(self._frames)
+            self._frames.clear()
+            return item
+
+
+class FrameSource:
+    """RGB frames from a camera index or a video file (optionally paced to its FPS)."""
+
+    def __init__(self, source, realtime=True):
+        self.source = int(source) if str(source).isdigit() else str(source)
+        self.capture = cv2.VideoCapture(self.source)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Could not open video source {source!r}")
+        is_file = isinstance(self.source, str)
+        fps = self.capture.get(cv2.CAP_PROP_FPS) if is_file else 0
+        self.frame_interval = 1.0 / fps if realtime and fps and fps > 0 else 0.0
+
+    def frames(self):
+        next_at = time.perf_counter()
+        while True:
+            ok, frame = self.capture.read()
+            if not ok:
+                return
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if self.frame_interval:
+                next_at += self.frame_interval
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+
+    def close(self):
+        self.capture.release()
+
+
+@dataclass
+class StreamResult:
+    seq: int
+    frame: np.ndarray
+    probabilities: dict  # smoothed over recent frames
+    inferred: bool  # False when the change gate reused the previous scores
+    captured_at: float
+    latency: float
+
+
+class StreamPipeline:
+    """Capture and inference threads joined by a :class:`LatestFrameQueue`.
+
+    Frames pass through a :class:`LiveScorer`, so static scenes skip the model
+    and the reported probabilities are smoothed over time.
+    """
+
+    def __init__(self, source, classifier, target_fps=5.0, queue_size=1, realtime=True, scorer=None):
+        self.source = FrameSource(source, realtime=realtime)
+        self.scorer = scorer or LiveScorer(classifier)
+        self.model_version = classifier.version
+        self.min_interval = 1.0 / target_fps if target_fps > 0 else 0.0
+        self.queue = LatestFrameQueue(queue_size)
+        self.stats = {"captured": 0, "scored": 0, "inferred": 0, "skipped": 0, "dropped": 0}
+        self._latest = None
+        self._stop = threading.Event()
+        self._capture_done = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="stream-capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="stream-inference", daemon=True),
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self.source.close()
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def latest(self):
+        """Most recent :class:`StreamResult` (or ``None``); never blocks on inference."""
+        return self._latest
+
+    def _capture_loop(self):
+        try:
+            for frame in self.source.frames():
+                if self._stop.is_set():
+                    break
+                self.queue.put((time.perf_counter(), frame))
+                self.stats["captured"] += 1
+        finally:
+            self._capture_done.set()
+
+    def _inference_loop(self):
+        seq = 0
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            item = self.queue.get(timeout=0.1)
+            if item is None:
+                if self._capture_done.is_set():
+                    break
+                continue
+            captured_at, frame = item
+            probabilities, inferred = self.scorer.score(frame)
+            if inferred:
+                damaged, intact = split_scores(probabilities)
+                metrics.record_verdicts([verdict(damaged, intact)], source="stream")
+                result_log.record("stream", damaged, intact, [verdict(damaged, intact)], model_version=self.model_version)
+            seq += 1
+            self._latest = StreamResult(seq, frame, probabilities, inferred, captured_at, time.perf_counter() - captured_at)
+            self.stats["scored"] = seq
+            self.stats["inferred"] = self.scorer.stats["inferred"]
+            self.stats["skipped"] = self.scorer.stats["skipped"]
+            metrics.stream_frames.inc(self.queue.dropped - self.stats["dropped"], outcome="dropped")
+            self.stats["dropped"] = self.queue.dropped
+            # Pace inference to the target rate; frames captured meanwhile are dropped
+            remaining = self.min_interval - (time.perf_counter() - started)
+            if remaining > 0:
+                self._stop.wait(remaining)
+
+
+def main(argv=None):
+    from inference import get_classifier
+
+    parser = argparse.ArgumentParser(description="Score a camera or video file as a live stream.")
+    parser.add_argument("source", help="camera index (e.g. 0) or video file path")
+    parser.add_argument("--fps", type=float, default=5.0, help="target inference rate")
+    parser.add_argument("--no-realtime", action="store_true", help="read video files as fast as possible")
+    parser.add_argument("--change-threshold", type=float, default=6.0, help="mean pixel diff that triggers inference")
+    parser.add_argument("--smoothing", type=float, default=0.3, help="EMA weight of the newest scores (1 = off)")
+    args = parser.parse_args(argv)
+
+    classifier = get_classifier()
+    scorer = LiveScorer(classifier, ChangeGate(args.change_threshold), VerdictSmoother(args.smoothing))
+    pipeline = StreamPipeline(args.source, classifier, args.fps, realtime=not args.no_realtime, scorer=scorer).start()
+    last_seq = 0
+    try:
+        while pipeline.running:
+            result = pipeline.latest()
+            if result is not None and result.seq != last_seq:
+                last_seq = result.seq
+                damaged, intact = split_scores(result.probabilities)
+                print(f"#{result.seq} {verdict(damaged, intact)} damaged={damaged:.3f} intact={intact:.3f} "
+                      f"{'scored' if result.inferred else 'unchanged'} latency={result.latency * 1000:.0f}ms")
+            time.sleep(0.02)
+    finally:
+        pipeline.stop()
+    print(pipeline.stats)
+
+
+if __name__ == "__main__":
+    main()